@@ -0,0 +1,184 @@
+# Sky Force stress benchmarks.
+#   python bench.py                      -> every scenario, JSON to stdout
+#   python bench.py enemies_500 --frames 1200 --out bench.json
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+import pygame
+
+import main
+from main import Game, EnemyStore, InputState, BULLET_HELL, WIDTH, HEIGHT
+
+# ---- Controllers ----
+class Hold:
+    # Same keys every frame; press_every adds a key on a fixed cadence (e.g. bombs)
+    def __init__(self, keys=(), press=None, press_every=0):
+        self.keys = InputState(keys)
+        self.pressed = InputState((*keys, press)) if press else self.keys
+        self.press_every = press_every
+        self.frame = 0
+
+    def poll(self, game):
+        self.frame += 1
+        if self.press_every and self.frame % self.press_every == 0: return self.pressed
+        return self.keys
+
+# ---- Scenario Helpers ----
+def invulnerable(game, difficulty=2.0):
+    # Full shield and a pinned score: kill rewards scale with difficulty, which scales
+    # with score, so an unpinned stress run snowballs into absurd enemy speeds
+    p = game.player
+    p.hp = p.max_hp
+    p.shield_timer = max(p.shield_timer, 2)
+    p.score = (difficulty - 1.0) * 500
+
+def fill_enemies(game, count, difficulty=2.0):
+    # Mixed STANDARD / KAMIKAZE / ACE, scattered over the top two thirds of the screen
+    while len(game.enemies) < count:
+        i = game.enemies.spawn(WIDTH, HEIGHT, difficulty, game.rng)
+        game.enemies.data[EnemyStore.Y, i] = game.rng.randint(-50, HEIGHT * 2 // 3)
+
+def fill_bullets(game, count):
+    n = count - len(game.bullets)
+    if n > 0:
+        xs, ys = game.np_rng.integers(0, WIDTH, n), game.np_rng.integers(0, HEIGHT, n)
+        game.bullets.spawn_many(xs, ys, np.zeros(n), -np.ones(n), is_enemy=False)
+
+# ---- Scenarios ----
+# name -> (controller factory, per-frame setup run before Game.update[, Balance])
+def _enemies_500(game):
+    invulnerable(game)
+    fill_enemies(game, 500)
+
+def _bullets_5000(game):
+    invulnerable(game)
+    fill_bullets(game, 5000)
+    fill_enemies(game, 40)
+
+def _triple_shot(game):
+    invulnerable(game)
+    game.player.triple_shot = 300
+    game.player.ammo = game.player.max_ammo
+    fill_enemies(game, 60)
+
+def _bullet_hell(game):
+    # BULLET_HELL's opening wave (a storm of spinning 36-way rings, roughly 10k enemy bullets)
+    # from the first frame instead of after the usual wave delay, restarted when it runs out
+    invulnerable(game)
+    fill_enemies(game, 20)
+    if not len(game.emitters): game.spawn_wave(0)
+
+def _bomb(game):
+    invulnerable(game)
+    game.player.bombs = 1
+    fill_enemies(game, 500)
+
+SCENARIOS = {
+    "autopilot": (lambda: None, lambda game: None),
+    "enemies_500": (lambda: Hold(), _enemies_500),
+    "bullets_5000": (lambda: Hold(), _bullets_5000),
+    "triple_shot": (lambda: Hold((pygame.K_SPACE,)), _triple_shot),
+    "bullet_hell": (lambda: Hold(), _bullet_hell, BULLET_HELL),
+    "bomb_full_screen": (lambda: Hold(press=pygame.K_b, press_every=30), _bomb),
+}
+
+# ---- Runner ----
+def percentiles(values):
+    a = np.asarray(values) * 1000.0
+    if not len(a): return {}
+    return {"p50": float(np.percentile(a, 50)), "p95": float(np.percentile(a, 95)),
+            "p99": float(np.percentile(a, 99)), "mean": float(a.mean()), "max": float(a.max())}
+
+def run_scenario(name, frames=600, warmup=60, seed=1):
+    controller, setup, *balance = SCENARIOS[name]
+    game = Game(headless=True, seed=seed, controller=controller(), balance=balance[0] if balance else None)
+    prof = game.profiler
+    for _ in range(warmup):
+        setup(game)
+        game.update()
+        game.draw()
+
+    # Allocation pass first, with the profiler off: its span floats and dicts would otherwise
+    # be counted as game allocations
+    collections = [0]
+    def on_gc(phase, info):
+        if phase == "start": collections[0] += 1
+    gc.callbacks.append(on_gc)
+    blocks = []
+    try:
+        for _ in range(frames):
+            setup(game)
+            before = sys.getallocatedblocks()
+            game.update()
+            game.draw()
+            blocks.append(sys.getallocatedblocks() - before)
+            game.end_frame()
+    finally:
+        gc.callbacks.remove(on_gc)
+
+    # Timed pass, profiled per phase
+    frame_times, phases, peak = [], {}, {}
+    def on_frame(stats):
+        for phase, t in stats["spans"].items(): phases.setdefault(phase, []).append(t)
+        for k, n in stats["counts"].items(): peak[k] = max(peak.get(k, 0), n)
+
+    prof.add_hook(on_frame)
+    try:
+        for _ in range(frames):
+            setup(game)
+            start = time.perf_counter()
+            game.update()
+            game.draw()
+            frame_times.append(time.perf_counter() - start)
+            game.end_frame()
+    finally:
+        prof.remove_hook(on_frame)
+
+    return {
+        "frames": frames,
+        "frame_ms": percentiles(frame_times),
+        "phases_ms": {phase: percentiles(ts) for phase, ts in sorted(phases.items())},
+        # Net interpreter blocks per frame (allocated minus freed) and GC passes, unprofiled
+        "net_blocks_per_frame": float(np.mean(blocks)),
+        "gc_collections": collections[0],
+        "peak_counts": peak,
+        "pools": game.pool_stats(),
+    }
+
+def run(names, frames=600, warmup=60, seed=1):
+    main.init_headless()
+    return {
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "numpy": np.__version__,
+        "seed": seed,
+        "scenarios": {name: run_scenario(name, frames, warmup, seed) for name in names},
+    }
+
+def cli(argv):
+    ap = argparse.ArgumentParser(description="Sky Force stress benchmarks")
+    ap.add_argument("scenarios", nargs="*", help=f"any of {', '.join(SCENARIOS)} (default: all)")
+    ap.add_argument("--frames", type=int, default=600)
+    ap.add_argument("--warmup", type=int, default=60)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", help="write JSON here instead of stdout")
+    args = ap.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown: ap.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    results = run(args.scenarios or list(SCENARIOS), args.frames, args.warmup, args.seed)
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f: f.write(text + "\n")
+        for name, r in results["scenarios"].items():
+            ms = r["frame_ms"]
+            print(f"{name:18s} p50 {ms['p50']:7.2f}  p95 {ms['p95']:7.2f}  p99 {ms['p99']:7.2f} ms")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    cli(sys.argv[1:])
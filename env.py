@@ -0,0 +1,181 @@
+# Gym-style training environment over the headless Game.
+#   env = SkyForceEnv()                     -> state-vector observations, no rendering
+#   obs = env.reset(seed=1)
+#   obs, reward, done, info = env.step(action)
+#   venv = VecEnv(8, obs="pixels")          -> N games stepped in one call, auto-reset on done
+#
+# An action is a bitmask over main.INPUT_BITS (left, right, up, down, fire, bomb); restart
+# is left to reset(). Reward is the change in player.score, done is game_over.
+import numpy as np
+
+import main
+from main import Game, EnemyStore, BulletStore, PowerUp, INPUT_BITS, WIDTH, HEIGHT, mask_input
+
+N_ACTIONS = 1 << (len(INPUT_BITS) - 1)  # every key but R
+LEFT, RIGHT, UP, DOWN, FIRE, BOMB = (1 << bit for bit in range(6))
+
+PLAYER_FEATURES = 10   # x, y, hp, ammo, bombs, reloading, triple, shield, speed, difficulty
+ENEMY_FEATURES = 6     # dx, dy, hp fraction, kamikaze, ace, present
+BULLET_FEATURES = 5    # dx, dy, vx, vy, present (enemy bullets only)
+POWERUP_FEATURES = 3 + len(PowerUp.TYPES)  # dx, dy, present, one-hot type
+
+# ---- Controller ----
+class ActionController:
+    # Feeds Game.update the keys for the current action; InputStates are built once per mask
+    inputs = None
+
+    def __init__(self):
+        if ActionController.inputs is None:
+            ActionController.inputs = [mask_input(m) for m in range(N_ACTIONS)]
+        self.keys = self.inputs[0]
+
+    def set(self, action):
+        self.keys = self.inputs[int(action) % N_ACTIONS]
+
+    def poll(self, game):
+        return self.keys
+
+# ---- Observations ----
+def nearest(xs, ys, px, py, k):
+    # Indices of the k points closest to (px, py), nearest first
+    order = np.argsort((xs - px) ** 2 + (ys - py) ** 2, kind="stable")
+    return order[:k]
+
+def state_vector(game, out, max_enemies=16, max_bullets=32, max_powerups=4):
+    # Fixed-size float32 description of the game: player, then the nearest enemies, enemy
+    # bullets and power-ups (relative positions, zero-padded). Writes into `out`.
+    out[:] = 0
+    p = game.player
+    px, py = p.rect.centerx, p.rect.centery
+    out[:PLAYER_FEATURES] = (px / WIDTH, py / HEIGHT, p.hp / 100, p.ammo / p.max_ammo, p.bombs / 5,
+                             p.reloading, p.triple_shot / 300, p.shield_timer / 300, p.speed_timer / 300,
+                             game.difficulty / 10)
+    at = PLAYER_FEATURES
+
+    d = game.enemies.view()
+    xs, ys = d[EnemyStore.X] + EnemyStore.SIZE / 2, d[EnemyStore.Y] + EnemyStore.SIZE / 2
+    idx = nearest(xs, ys, px, py, max_enemies)
+    e = out[at:at + max_enemies * ENEMY_FEATURES].reshape(max_enemies, ENEMY_FEATURES)
+    n = len(idx)
+    e[:n, 0], e[:n, 1] = (xs[idx] - px) / WIDTH, (ys[idx] - py) / HEIGHT
+    e[:n, 2] = d[EnemyStore.HP, idx] / d[EnemyStore.MAX_HP, idx]
+    e[:n, 3] = d[EnemyStore.TYPE, idx] == EnemyStore.KAMIKAZE
+    e[:n, 4] = d[EnemyStore.TYPE, idx] == EnemyStore.ACE
+    e[:n, 5] = 1
+    at += max_enemies * ENEMY_FEATURES
+
+    d = game.bullets.view()
+    d = d[:, d[BulletStore.ENEMY] > 0]
+    xs, ys = d[BulletStore.X] + BulletStore.W / 2, d[BulletStore.Y] + BulletStore.H / 2
+    idx = nearest(xs, ys, px, py, max_bullets)
+    b = out[at:at + max_bullets * BULLET_FEATURES].reshape(max_bullets, BULLET_FEATURES)
+    n = len(idx)
+    b[:n, 0], b[:n, 1] = (xs[idx] - px) / WIDTH, (ys[idx] - py) / HEIGHT
+    b[:n, 2] = d[BulletStore.DX, idx] * d[BulletStore.SPEED, idx] / 12
+    b[:n, 3] = d[BulletStore.DY, idx] * d[BulletStore.SPEED, idx] / 12
+    b[:n, 4] = 1
+    at += max_bullets * BULLET_FEATURES
+
+    pus = game.powerups
+    if pus:
+        xs = np.array([pu.rect.centerx for pu in pus], float)
+        ys = np.array([pu.rect.centery for pu in pus], float)
+        u = out[at:at + max_powerups * POWERUP_FEATURES].reshape(max_powerups, POWERUP_FEATURES)
+        for row, i in enumerate(nearest(xs, ys, px, py, max_powerups).tolist()):
+            u[row, :3] = ((xs[i] - px) / WIDTH, (ys[i] - py) / HEIGHT, 1)
+            u[row, 3 + PowerUp.TYPES.index(pus[i].type)] = 1
+    return out
+
+def state_size(max_enemies=16, max_bullets=32, max_powerups=4):
+    return (PLAYER_FEATURES + max_enemies * ENEMY_FEATURES + max_bullets * BULLET_FEATURES
+            + max_powerups * POWERUP_FEATURES)
+
+# ---- Environment ----
+class SkyForceEnv:
+    # obs="state": float32 vector from state_vector(), a fresh array per step.
+    # obs="pixels": view of the off-screen frame buffer (game.pixels), (WIDTH, HEIGHT, 3) RGB
+    # uint8 with no copy. The next rendering step overwrites it, so copy what must be kept.
+    # Pixels only change on steps that render.
+    # render: draw every step (default: only when obs="pixels"); step(render=...) overrides it.
+    # frame_skip repeats each action that many simulation steps (rewards summed, one render).
+    def __init__(self, obs="state", render=None, frame_skip=1, max_steps=None,
+                 max_enemies=16, max_bullets=32, max_powerups=4):
+        if obs not in ("state", "pixels"): raise ValueError(f"unknown observation type {obs!r}")
+        main.init_headless()
+        self.obs_type = obs
+        self.render = (obs == "pixels") if render is None else render
+        self.frame_skip = frame_skip
+        self.max_steps = max_steps
+        self.limits = (max_enemies, max_bullets, max_powerups)
+        self.controller = ActionController()
+        self.game = Game(headless=True, seed=0, controller=self.controller)
+        self.steps = 0
+        self.score = 0.0
+
+    @property
+    def observation_shape(self):
+        return (WIDTH, HEIGHT, 3) if self.obs_type == "pixels" else (state_size(*self.limits),)
+
+    def reset(self, seed=None):
+        self.game.new_game(seed)
+        self.controller.set(0)
+        self.steps = 0
+        self.score = 0.0
+        if self.render: self.game.draw()
+        return self.observe()
+
+    def observe(self):
+        if self.obs_type == "pixels": return self.game.pixels[:, :, 2::-1].transpose(1, 0, 2)
+        return state_vector(self.game, np.empty(state_size(*self.limits), np.float32), *self.limits)
+
+    def step(self, action, render=None):
+        game = self.game
+        self.controller.set(action)
+        for _ in range(self.frame_skip):
+            game.update()
+            game.end_frame()
+            if game.game_over: break
+        if self.render if render is None else render: game.draw()
+        self.steps += 1
+        reward = game.player.score - self.score
+        self.score = game.player.score
+        truncated = self.max_steps is not None and self.steps >= self.max_steps
+        info = {"seed": game.seed, "steps": self.steps, "score": self.score, "truncated": truncated}
+        return self.observe(), reward, game.game_over or truncated, info
+
+class VecEnv:
+    # N independent games stepped together. Observations come back in one preallocated batch
+    # (N, *observation_shape), overwritten by the next call. A finished game restarts at once
+    # on the next seed for its slot, and its last observation goes in info["final_observation"].
+    def __init__(self, n, seed=0, **kwargs):
+        self.envs = [SkyForceEnv(**kwargs) for _ in range(n)]
+        self.seed = seed
+        self.episodes = [0] * n
+        shape = self.envs[0].observation_shape
+        self.obs = np.zeros((n, *shape), np.uint8 if kwargs.get("obs") == "pixels" else np.float32)
+        self.rewards = np.zeros(n)
+        self.dones = np.zeros(n, bool)
+
+    def __len__(self):
+        return len(self.envs)
+
+    def slot_seed(self, i):
+        return self.seed + i + self.episodes[i] * len(self.envs)
+
+    def reset(self):
+        for i, env in enumerate(self.envs):
+            self.episodes[i] = 0
+            self.obs[i] = env.reset(self.slot_seed(i))
+        return self.obs
+
+    def step(self, actions, render=None):
+        infos = []
+        for i, (env, action) in enumerate(zip(self.envs, actions)):
+            obs, self.rewards[i], self.dones[i], info = env.step(action, render)
+            if self.dones[i]:
+                info["final_observation"] = np.array(obs)
+                self.episodes[i] += 1
+                obs = env.reset(self.slot_seed(i))
+            self.obs[i] = obs
+            infos.append(info)
+        return self.obs, self.rewards, self.dones, infos
@@ -1,9 +1,22 @@
+# /// script
+# dependencies = [
+#  "numpy",
+# ]
+# ///
+import time
+BOOT = time.perf_counter() # Startup timeline origin, taken before the heavy imports
 import pygame
+import numpy as np
 import random
 import math
 import sys
 import os
 import asyncio
+import array
+import struct
+import zlib
+import queue
+import threading
 
 # ---- Settings & Polish ----
 WIDTH, HEIGHT = 800, 600
@@ -21,197 +34,770 @@ WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 
 # ---- Asset System ----
+class Atlas:
+    # Shelf-packed sprite sheets. Small sprites share a few large surfaces and are drawn as
+    # (sheet, dest, area) entries, so a whole layer goes out in one Surface.blits() call.
+    def __init__(self, size=512):
+        self.size = size
+        self.sheets = []
+        self.entries = {}  # key -> (sheet, area)
+        self.x = self.y = self.shelf = 0
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def add(self, key, surf):
+        w, h = surf.get_size()
+        if w > self.size or h > self.size: entry = (surf, surf.get_rect()) # Too big to pack
+        else:
+            if self.x + w > self.size: self.x, self.y, self.shelf = 0, self.y + self.shelf, 0
+            if not self.sheets or self.y + h > self.size:
+                self.sheets.append(pygame.Surface((self.size, self.size), pygame.SRCALPHA).convert_alpha())
+                self.x = self.y = self.shelf = 0
+            sheet = self.sheets[-1]
+            # MAX onto the cleared sheet copies the pixels verbatim, alpha included
+            sheet.blit(surf, (self.x, self.y), special_flags=pygame.BLEND_RGBA_MAX)
+            entry = (sheet, pygame.Rect(self.x, self.y, w, h))
+            self.x += w
+            self.shelf = max(self.shelf, h)
+        self.entries[key] = entry
+        return entry
+
+class VoiceManager:
+    # Fixed pool of mixer channels. Each sound has a voice cap and a priority: over its cap a
+    # sound restarts its own oldest voice; with every channel busy it steals the oldest voice
+    # of the lowest priority at or below its own, else it is dropped. Volume is set on the
+    # channel, never on the shared Sound. Repeat triggers of a sound within one frame
+    # (several kills, catch-up steps) collapse into the first voice at the loudest volume.
+    CHANNELS = 16
+    LIMITS = {  # name -> (max voices, priority)
+        "shoot.wav": (3, 0),
+        "explode.wav": (4, 1),
+        "powerup.wav": (2, 2),
+        "bomb.wav": (1, 3),
+    }
+    DEFAULT_LIMIT = (2, 1)
+
+    def __init__(self, channels=CHANNELS):
+        self.size = channels
+        self.channels = None # Opened on first play, once the mixer is up
+        self.voices = [None] * channels # Per channel: (name, priority, start tick)
+        self.tick = 0
+        self.frame = {} # name -> Channel, voices started this frame
+        self.played = self.deduped = self.stolen = self.dropped = 0
+
+    def open(self):
+        pygame.mixer.set_num_channels(self.size)
+        self.channels = [pygame.mixer.Channel(i) for i in range(self.size)]
+
+    def pick(self, name, prio):
+        # Channel index for a new voice of `name`, or None
+        busy = [ch.get_busy() for ch in self.channels]
+        own = [i for i, v in enumerate(self.voices) if busy[i] and v[0] == name]
+        if len(own) >= self.LIMITS.get(name, self.DEFAULT_LIMIT)[0]:
+            return min(own, key=lambda i: self.voices[i][2])
+        if not all(busy): return busy.index(False)
+        victims = [i for i, v in enumerate(self.voices) if v and v[1] <= prio]
+        if not victims: return None
+        self.stolen += 1
+        return min(victims, key=lambda i: self.voices[i][1:])
+
+    def play(self, name, sound, vol):
+        ch = self.frame.get(name)
+        if ch:
+            if vol > ch.get_volume(): ch.set_volume(vol)
+            self.deduped += 1
+            return
+        if self.channels is None: self.open()
+        prio = self.LIMITS.get(name, self.DEFAULT_LIMIT)[1]
+        i = self.pick(name, prio)
+        if i is None:
+            self.dropped += 1
+            return
+        ch = self.channels[i]
+        ch.play(sound)
+        ch.set_volume(vol) # After play(): starting a sound resets the channel volume
+        self.voices[i] = (name, prio, self.tick)
+        self.tick += 1
+        self.frame[name] = ch
+        self.played += 1
+
+    def end_frame(self):
+        if self.frame: self.frame = {}
+
+    def stats(self):
+        busy = sum(ch.get_busy() for ch in self.channels) if self.channels else 0
+        return {"busy": busy, "played": self.played, "deduped": self.deduped,
+                "stolen": self.stolen, "dropped": self.dropped}
+
+# Everything the game reads from disk, decoded up front behind the loading screen:
+# images as (name, size, opaque), sounds by name
+MANIFEST = {
+    "images": (("plane.png", (64, 74), False), ("enemy_plane.png", (50, 50), False),
+               ("background_night.png", (WIDTH, HEIGHT), True), ("cloud.png", (200, 100), False),
+               ("city.png", (WIDTH, 300), False)),
+    "sounds": ("shoot.wav", "bomb.wav", "explode.wav", "powerup.wav"),
+}
+
 class AssetManager:
     def __init__(self):
-        self.images = {}
-        self.sounds = {}
-
-    def load_image(self, name, size=None):
-        if name in self.images: return self.images[name]
-        try:
-            path = os.path.join(os.path.dirname(__file__), name)
-            img = pygame.image.load(path).convert_alpha()
+        self.images = {}  # (name, size, tint) -> Surface, None if it failed to load
+        self.decoded = {} # name -> raw decoded Surface (None: missing/broken), filled by preload()
+        self.sounds = {}  # name -> Sound, None if it failed to load
+        self.fonts = {}
+        self.voices = VoiceManager()
+        self.atlas = Atlas()
+        self.muted = False
+
+    def path(self, name):
+        return os.path.join(os.path.dirname(__file__), name)
+
+    def decode(self, name):
+        # File -> unconverted Surface; no display needed, so it can run on a worker thread
+        try: self.decoded[name] = pygame.image.load(self.path(name))
+        except: self.decoded[name] = None
+
+    def load_image(self, name, size=None, tint=None, opaque=False):
+        # Opaque art (full-screen backgrounds) skips per-pixel alpha, which is far cheaper to blit
+        key = (name, size, tint)
+        if key in self.images: return self.images[key]
+        if name not in self.decoded: self.decode(name)
+        img = self.decoded[name]
+        if img:
+            img = img.convert() if opaque else img.convert_alpha()
             if size: img = pygame.transform.scale(img, size)
-            self.images[name] = img
-            return img
-        except: return None
+            if tint: img.fill(tint, special_flags=pygame.BLEND_RGB_MULT)
+        self.images[key] = img
+        return img
+
+    def sprite(self, name, size=None, tint=None):
+        # Image packed into the atlas: (sheet, area), or None if it failed to load
+        key = (name, size, tint)
+        entry = self.atlas.get(key)
+        if entry is None:
+            img = self.load_image(name, size, tint)
+            if img: entry = self.atlas.add(key, img)
+        return entry
+
+    def baked(self, key, make):
+        # Procedural sprite rendered once by make() and packed into the atlas
+        return self.atlas.get(key) or self.atlas.add(key, make())
+
+    def font(self, size, bold=True):
+        # pygame's bundled default font (freesansbold.ttf): no system font scan at startup
+        key = (size, bold)
+        if key not in self.fonts:
+            font = self.fonts[key] = pygame.font.Font(None, size)
+            font.set_bold(bold)
+        return self.fonts[key]
 
     def load_sound(self, name):
+        # Failures are cached too, so a missing file is not retried on every play()
         if name in self.sounds: return self.sounds[name]
-        try:
-            path = os.path.join(os.path.dirname(__file__), name)
-            snd = pygame.mixer.Sound(path)
-            self.sounds[name] = snd
-            return snd
-        except: return None
+        try: snd = pygame.mixer.Sound(self.path(name))
+        except: snd = None
+        self.sounds[name] = snd
+        return snd
 
     def play(self, name, vol=0.5):
+        if self.muted: return
         s = self.load_sound(name)
-        if s: 
-            s.set_volume(vol)
-            s.play()
+        if s: self.voices.play(name, s, vol)
+
+    async def preload(self, manifest, progress=None):
+        # Decode every manifest file, then convert and scale the images (needs the display, so
+        # main thread only). Decoding runs on a thread pool where threads exist; under
+        # emscripten it goes one file at a time. progress(done, total) runs after each item
+        # and the event loop gets a turn in between, so a loading screen keeps drawing.
+        jobs = [(self.decode, name) for name, _, _ in manifest["images"] if name not in self.decoded]
+        if not self.muted: jobs += [(self.load_sound, name) for name in manifest["sounds"]]
+        total, done = len(jobs) + len(manifest["images"]), 0
+        if sys.platform == "emscripten":
+            for fn, name in jobs:
+                fn(name)
+                done += 1
+                if progress: progress(done, total)
+                await asyncio.sleep(0)
+        elif jobs:
+            from concurrent.futures import ThreadPoolExecutor
+            loop = asyncio.get_running_loop()
+            with ThreadPoolExecutor(min(8, len(jobs))) as pool:
+                for future in asyncio.as_completed([loop.run_in_executor(pool, fn, name) for fn, name in jobs]):
+                    await future
+                    done += 1
+                    if progress: progress(done, total)
+        for name, size, opaque in manifest["images"]:
+            self.load_image(name, size, opaque=opaque)
+            done += 1
+            if progress: progress(done, total)
+            await asyncio.sleep(0)
 
 assets = AssetManager()
 
+# ---- Balance ----
+class Balance:
+    # Gameplay tuning in one place (sweep.py varies it); the defaults are the shipped game
+    DEFAULTS = {
+        "score_per_level": 500,              # difficulty = 1 + score / score_per_level
+        "spawn_rate": 0.02,                  # per-frame spawn chance = spawn_rate * difficulty
+        "kill_score": 100,                   # x difficulty
+        "bomb_score": 50,                    # per enemy cleared by a bomb
+        "loot_chance": 0.25,
+        "loot_weights": (30, 25, 15, 20, 10), # PowerUp.TYPES order
+        "kamikaze_roll": 0.2,                # type roll below this -> KAMIKAZE ...
+        "kamikaze_difficulty": 1.2,          # ... once difficulty exceeds this
+        "ace_roll": 0.4,
+        "ace_difficulty": 1.5,
+        "enemy_hp": (30, 20, 60),            # x difficulty, by EnemyStore type
+        "enemy_speed": (3, 4, 2),            # x difficulty, by EnemyStore type
+        "bullet_damage": 10,
+        "ram_damage": 30,
+        "wave_every": 0,                     # steps between boss waves; 0 = off
+        "wave_emitters": 4,                  # emitters per wave, spread across the top
+        "wave_patterns": ("spiral", "fan", "ring", "burst"), # PATTERNS names, one per wave in turn
+    }
+
+    def __init__(self, **overrides):
+        unknown = set(overrides) - set(self.DEFAULTS)
+        if unknown: raise TypeError(f"unknown balance parameter(s): {', '.join(sorted(unknown))}")
+        self.__dict__.update(self.DEFAULTS, **overrides)
+
+    def as_dict(self):
+        return {k: getattr(self, k) for k in self.DEFAULTS}
+
+DEFAULT_BALANCE = Balance()
+BULLET_HELL = Balance(wave_every=FPS * 10, wave_patterns=("storm", "spiral", "storm", "ring"))
+PRESETS = (DEFAULT_BALANCE, BULLET_HELL) # Replays name their Balance by index here
+
+# ---- Entity Stores ----
+# Struct-of-arrays storage: one row per field, one column per entity. Live entities are
+# packed into [:count] in spawn order; removal is a stable mask compaction, so list order
+# (which decides e.g. which enemy a bullet hits first) is preserved.
+class EntityStore:
+    FIELDS = ()
+
+    def __init__(self, capacity=64):
+        self.data = np.zeros((len(self.FIELDS), capacity))
+        self.count = 0
+        self.spawned = 0
+        self.grown = 0
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def view(self):
+        return self.data[:, :self.count]
+
+    def alloc(self, n=1):
+        # Columns for n new entities; capacity doubles when full and is never given back
+        start = self.count
+        if start + n > self.data.shape[1]:
+            self.reserve(max(self.data.shape[1] * 2, start + n))
+            self.grown += 1
+        self.count += n
+        self.spawned += n
+        return self.data[:, start:start + n]
+
+    def reserve(self, n):
+        # Grow capacity to at least n now, so a later burst never reallocates mid-frame
+        if n > self.data.shape[1]:
+            grown = np.zeros((len(self.FIELDS), n))
+            grown[:, :self.count] = self.data[:, :self.count]
+            self.data = grown
+
+    def keep(self, mask):
+        n = int(np.count_nonzero(mask))
+        if n != self.count:
+            self.data[:, :n] = self.data[:, :self.count][:, mask]
+            self.count = n
+
+    def stats(self):
+        return {"size": self.data.shape[1], "in_use": self.count, "spawned": self.spawned, "grown": self.grown}
+
+    def snapshot(self):
+        return struct.pack("<I", self.count) + self.view().tobytes()
+
+    def restore(self, buf, at):
+        # Reads a snapshot() at offset `at`; returns the offset just past it
+        n, = struct.unpack_from("<I", buf, at)
+        rows = len(self.FIELDS)
+        self.count = 0
+        self.alloc(n)[:] = np.frombuffer(buf, np.float64, rows * n, at + 4).reshape(rows, n)
+        self.spawned -= n # Restoring is not spawning
+        return at + 4 + 8 * rows * n
+
+def lerp_back(d, cur, prev, back):
+    # Row `cur` moved `back` of the way towards row `prev` (interpolated rendering)
+    return d[cur] + (d[prev] - d[cur]) * back if back else d[cur]
+
+def rect_round(v):
+    # pygame.Rect rounds float assignments half away from zero
+    return np.trunc(v + np.copysign(0.5, v))
+
 # ---- VFX ----
-class TrailParticle:
-    def __init__(self, x, y, color=NEON_BLUE):
-        self.x = x
-        self.y = y
-        self.size = random.randint(4, 8)
-        self.life = 20
-        self.vel_y = random.uniform(2, 4)
-        self.vel_x = random.uniform(-1, 1)
-        self.color = color
+class ParticleSystem(EntityStore):
+    FIELDS = ("x", "y", "vx", "vy", "life", "life0", "size", "shrink", "color")
+    X, Y, VX, VY, LIFE, LIFE0, SIZE, SHRINK, COLOR = range(9)
+    sprites = {}  # (color index, size in 1/5 px, alpha) -> atlas entry, shared by all systems
+    palette = []
+
+    def __init__(self, capacity=256, alpha=100, seed=None):
+        super().__init__(capacity)
+        self.alpha = alpha  # peak glow alpha of a fresh particle
+        self.rng = np.random.default_rng(seed)
+
+    def color_index(self, color):
+        if color not in self.palette: self.palette.append(color)
+        return self.palette.index(color)
+
+    def emit(self, xs, ys, color, size=(4, 8), vel_x=(-1, 1), vel_y=(2, 4), life=20, shrink=0.2):
+        xs, ys = np.atleast_1d(xs), np.atleast_1d(ys)
+        n = len(xs)
+        d = self.alloc(n)
+        d[self.X], d[self.Y] = xs, ys
+        d[self.VX] = self.rng.uniform(vel_x[0], vel_x[1], n)
+        d[self.VY] = self.rng.uniform(vel_y[0], vel_y[1], n)
+        d[self.LIFE] = d[self.LIFE0] = life
+        d[self.SIZE] = self.rng.integers(size[0], size[1] + 1, n)
+        d[self.SHRINK] = shrink
+        d[self.COLOR] = self.color_index(color)
 
     def update(self):
-        self.y += self.vel_y
-        self.x += self.vel_x
-        self.life -= 1
-        self.size -= 0.2
+        d = self.view()
+        d[self.X] += d[self.VX]
+        d[self.Y] += d[self.VY]
+        d[self.LIFE] -= 1
+        d[self.SIZE] -= d[self.SHRINK]
+        self.keep(d[self.LIFE] > 0)
 
-    def draw(self, surface, ox, oy):
-        if self.life > 0:
-            alpha = int((self.life / 20) * 100)
-            s = pygame.Surface((int(self.size*2), int(self.size*2)), pygame.SRCALPHA)
-            pygame.draw.circle(s, (*self.color, alpha), (self.size, self.size), self.size)
-            surface.blit(s, (self.x + ox - self.size, self.y + oy - self.size))
+    def sprite(self, key):
+        s = self.sprites.get(key)
+        if s is None:
+            ci, sq, alpha = key // 65536, key // 256 % 256, key % 256
+            size = sq / 5
+            s = pygame.Surface((int(size*2), int(size*2)), pygame.SRCALPHA)
+            pygame.draw.circle(s, (*self.palette[ci], alpha), (size, size), size)
+            s = self.sprites[key] = assets.atlas.add(("glow", key), s)
+        return s
+
+    def draw(self, surface, ox, oy, back=0.0):
+        # back: fraction of a step to rewind (interpolated rendering); particles move linearly.
+        # Returns the number of blits issued.
+        if not self.alpha: return 0
+        d = self.view()
+        # Quantize to the same size/alpha steps the trail produces, so the cache stays small and exact
+        sq = np.clip(np.rint(d[self.SIZE] * 5), 1, 255).astype(np.int64)
+        alpha = (d[self.LIFE] / d[self.LIFE0] * self.alpha).astype(np.int64)
+        keys = (d[self.COLOR].astype(np.int64) * 256 + sq) * 256 + alpha
+        xs = (d[self.X] - d[self.VX] * back + ox - d[self.SIZE]).tolist()
+        ys = (d[self.Y] - d[self.VY] * back + oy - d[self.SIZE]).tolist()
+        batch = []
+        for k, x, y in zip(keys.tolist(), xs, ys):
+            sheet, area = self.sprite(k)
+            batch.append((sheet, (x, y), area))
+        surface.blits(batch, doreturn=False)
+        return len(batch)
+
+# ---- Pooling ----
+# Free-list pool: entities are built once, then re-spawned in place. Pooled classes
+# build their reusable members in __init__ and take per-spawn state in spawn().
+class Pool:
+    def __init__(self, cls):
+        self.cls = cls
+        self.free = []
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, *args, **kwargs):
+        if self.free:
+            obj = self.free.pop()
+            self.reused += 1
+        else:
+            obj = self.cls()
+            self.created += 1
+        obj.spawn(*args, **kwargs)
+        return obj
+
+    def release_all(self, items):
+        self.free.extend(items)
+        items.clear()
+
+    def compact(self, items):
+        # In-place compaction: survivors slide down (order kept), the rest go back on the free list
+        w = 0
+        for obj in items:
+            if obj.live():
+                items[w] = obj
+                w += 1
+            else: self.free.append(obj)
+        del items[w:]
+
+    def stats(self):
+        return {"size": self.created, "free": len(self.free), "in_use": self.created - len(self.free),
+                "reused": self.reused}
 
 class Explosion:
-    def __init__(self, x, y, color):
+    __slots__ = ("x", "y", "color", "life", "radius")
+
+    def spawn(self, x, y, color):
         self.x = x
         self.y = y
         self.color = color
         self.life = 15
         self.radius = 5
 
+    def live(self):
+        return self.life > 0
+
     def update(self):
         self.life -= 1
         self.radius += 2
 
-    def draw(self, surface, ox, oy):
+    def draw(self, surface, ox, oy, back=0.0, detail=2):
+        # detail: 2 = ring and core, 1 = ring, 0 = core
         if self.life > 0:
-            pygame.draw.circle(surface, self.color, (int(self.x + ox), int(self.y + oy)), int(self.radius), width=3)
-            pygame.draw.circle(surface, WHITE, (int(self.x + ox), int(self.y + oy)), int(self.radius/2))
+            radius = self.radius - 2 * back
+            if detail: pygame.draw.circle(surface, self.color, (int(self.x + ox), int(self.y + oy)), int(radius), width=3)
+            if detail != 1: pygame.draw.circle(surface, WHITE, (int(self.x + ox), int(self.y + oy)), int(radius/2))
 
 class ScreenShake:
-    def __init__(self):
+    # Own RNG: the offset is rolled in draw(), so it must not touch the simulation's stream
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
         self.timer = 0
         self.intensity = 0
     def trigger(self, amount, time):
         self.intensity = amount
         self.timer = time
+    def update(self):
+        if self.timer > 0: self.timer -= 1
     def get_offset(self):
         if self.timer > 0:
-            self.timer -= 1
-            return random.randint(-self.intensity, self.intensity), random.randint(-self.intensity, self.intensity)
+            return self.rng.randint(-self.intensity, self.intensity), self.rng.randint(-self.intensity, self.intensity)
         return 0, 0
 
+# ---- Collision Broadphase ----
+# Uniform grid rebuilt every query. Boxes are (n, 4) int arrays of x, y, w, h (np.array(rects)).
+class SpatialHash:
+    BIAS = 1 << 20  # keeps off-screen (negative) cells positive inside the packed key
+
+    def __init__(self, cell=64):
+        self.cell = cell
+
+    def cells(self, boxes):
+        # One (cell key, box index) entry per grid cell a box touches
+        c = self.cell
+        x0, y0 = boxes[:, 0] // c, boxes[:, 1] // c
+        nx = (boxes[:, 0] + np.maximum(boxes[:, 2], 1) - 1) // c - x0 + 1
+        ny = (boxes[:, 1] + np.maximum(boxes[:, 3], 1) - 1) // c - y0 + 1
+        per_box = nx * ny
+        idx = np.repeat(np.arange(len(boxes)), per_box)
+        k = np.arange(len(idx)) - np.repeat(np.cumsum(per_box) - per_box, per_box)
+        cx = x0[idx] + k % nx[idx]
+        cy = y0[idx] + k // nx[idx]
+        return (cy + self.BIAS) * (self.BIAS * 2) + (cx + self.BIAS), idx
+
+    def pairs(self, a, b):
+        # Candidate (i, j) pairs whose boxes share a cell, sorted by i then j, no duplicates
+        if not len(a) or not len(b):
+            return np.empty(0, np.int64), np.empty(0, np.int64)
+        akey, aidx = self.cells(a)
+        bkey, bidx = self.cells(b)
+        order = np.argsort(bkey, kind="stable")
+        bkey, bidx = bkey[order], bidx[order]
+        lo = np.searchsorted(bkey, akey, "left")
+        hits = np.searchsorted(bkey, akey, "right") - lo
+        ia = np.repeat(aidx, hits)
+        k = np.arange(len(ia)) - np.repeat(np.cumsum(hits) - hits, hits)
+        ib = bidx[np.repeat(lo, hits) + k]
+        code = np.unique(ia * len(b) + ib)
+        return code // len(b), code % len(b)
+
+    def candidates(self, a, b):
+        # {i: [j, ...]} view of pairs() for walking hits in list order
+        out = {}
+        for i, j in zip(*(v.tolist() for v in self.pairs(a, b))):
+            out.setdefault(i, []).append(j)
+        return out
+
+def boxes(rects):
+    return np.array(rects, dtype=np.int64).reshape(-1, 4)
+
+def overlaps(a, b):
+    # Vectorized Rect.colliderect over rows of (x, y, w, h) boxes
+    return ((a[..., 0] < b[..., 0] + b[..., 2]) & (b[..., 0] < a[..., 0] + a[..., 2]) &
+            (a[..., 1] < b[..., 1] + b[..., 3]) & (b[..., 1] < a[..., 1] + a[..., 3]))
+
+# ---- Bullet Patterns ----
+# Enemy fire as data. A spec is one volley of `count` bullets:
+#   spread: fanned over `arc` degrees around straight down
+#   aimed:  fanned over `arc` degrees around the line to the player
+#   ring:   evenly round the full circle
+# Each volley after the first turns by `spin` degrees (a ring with spin is a spiral). An
+# emitter fires `volleys` volleys, `every` steps apart; enemies fire one volley per shot.
+PATTERN_SPECS = {
+    "down":   {"kind": "spread", "count": 1},
+    "aimed":  {"kind": "aimed", "count": 1},
+    "fan":    {"kind": "spread", "count": 7, "arc": 90, "speed": 5, "every": 20, "volleys": 8},
+    "burst":  {"kind": "aimed", "count": 3, "arc": 16, "speed": 8, "every": 6, "volleys": 12},
+    "ring":   {"kind": "ring", "count": 24, "speed": 4, "every": 30, "volleys": 6},
+    "spiral": {"kind": "ring", "count": 4, "spin": 9, "speed": 4, "every": 3, "volleys": 120},
+    "storm":  {"kind": "ring", "count": 36, "spin": 5, "speed": 3.5, "every": 2, "volleys": 300},
+}
+
+class BulletPattern:
+    KINDS = ("spread", "aimed", "ring")
+
+    def __init__(self, kind, count=1, arc=0, spin=0, speed=7, every=1, volleys=1):
+        if kind not in self.KINDS: raise ValueError(f"unknown pattern kind {kind!r}")
+        self.kind, self.count, self.speed, self.every, self.volleys = kind, count, speed, every, volleys
+        self.spin = math.radians(spin)
+        if kind == "ring": self.offsets = np.radians(np.arange(count) * (360 / count))
+        elif count > 1: self.offsets = np.radians(np.linspace(-arc / 2, arc / 2, count))
+        else: self.offsets = np.zeros(1)
+
+    def volley(self, xs, ys, px, py, angles=None):
+        # Directions for one volley from every origin (xs, ys), origin-major: (dx, dy) arrays
+        # of len(xs) * count. angles: extra turn per origin (radians). A zero turn leaves the
+        # base direction bit-exact, so single shots match the old hard-coded fire.
+        n = len(xs)
+        if self.kind == "aimed":
+            vx, vy = px - xs, py - ys
+            length = np.hypot(vx, vy)
+            ok = length > 0
+            length[~ok] = 1
+            bx, by = np.where(ok, vx / length, 0.0), np.where(ok, vy / length, 1.0)
+        else: bx, by = np.zeros(n), np.ones(n)
+        a = self.offsets if angles is None else self.offsets + angles[:, None]
+        c, s = np.cos(a), np.sin(a)
+        bx, by = bx[:, None], by[:, None]
+        return (bx * c - by * s).ravel(), (bx * s + by * c).ravel()
+
+PATTERNS = {name: BulletPattern(**spec) for name, spec in PATTERN_SPECS.items()}
+PATTERN_NAMES = tuple(PATTERNS) # Stores keep the index
+
+def fire(bullets, groups, px, py, lead=0.0):
+    # groups: (owners, pattern, xs, ys, angles) per pattern firing this step. Bullets leave
+    # `lead` px below their origin and are stored in owner order whatever the grouping.
+    if not groups: return
+    parts = []
+    for owners, pat, xs, ys, angles in groups:
+        dx, dy = pat.volley(xs, ys, px, py, angles)
+        parts.append((np.repeat(xs, pat.count), np.repeat(ys, pat.count) + lead, dx, dy,
+                      np.full(len(dx), pat.speed, float), np.repeat(owners, pat.count)))
+    cols = [np.concatenate(c) for c in zip(*parts)] if len(parts) > 1 else parts[0]
+    if len(parts) > 1:
+        order = np.argsort(cols[5], kind="stable")
+        cols = [c[order] for c in cols]
+    xs, ys, dx, dy, speed, _ = cols
+    bullets.spawn_many(xs, ys, dx, dy, speed=speed)
+
 # ---- Game Entities ----
-class Bullet(pygame.sprite.Sprite):
-    def __init__(self, x, y, direction=None, is_enemy=False):
-        super().__init__()
-        self.is_enemy = is_enemy
-        self.rect = pygame.Rect(x-3, y, 6, 20)
-        self.speed = 12 if not is_enemy else 7
-        self.color = NEON_RED if is_enemy else NEON_BLUE
-        # If direction is provided (Vector2), use it. Otherwise go straight.
-        self.direction = direction if direction else pygame.Vector2(0, 1 if is_enemy else -1)
+# Bullets and enemies are batch-updated stores; a whole type advances in one NumPy step.
+class BulletStore(EntityStore):
+    FIELDS = ("x", "y", "dx", "dy", "speed", "enemy", "px", "py")
+    X, Y, DX, DY, SPEED, ENEMY, PX, PY = range(8) # px, py: position before the last step
+    W, H = 6, 20
+    HELL_CAPACITY = 16384 # Reserved up front in bullet-hell mode so waves never grow the store
+    sprites = {}  # is_enemy -> Surface, shared by all stores
+
+    def spawn(self, x, y, is_enemy=False, dx=0.0, dy=None):
+        # (x, y) is the muzzle: the bullet is centred on x and hangs down from y
+        d = self.alloc(1)
+        if dy is None: dy = 1 if is_enemy else -1 # Straight down (enemy) or up (player)
+        d[:, 0] = (x - 3, y, dx, dy, 7 if is_enemy else 12, is_enemy, x - 3, y)
+
+    def spawn_many(self, xs, ys, dxs, dys, is_enemy=True, speed=None):
+        d = self.alloc(len(xs))
+        d[self.X], d[self.Y], d[self.DX], d[self.DY] = xs - 3, ys, dxs, dys
+        d[self.PX], d[self.PY] = d[self.X], d[self.Y]
+        d[self.SPEED] = (7 if is_enemy else 12) if speed is None else speed
+        d[self.ENEMY] = is_enemy
 
     def update(self):
-        self.rect.x += self.direction.x * self.speed
-        self.rect.y += self.direction.y * self.speed
+        d = self.view()
+        d[self.PX], d[self.PY] = d[self.X], d[self.Y]
+        d[self.X] = rect_round(d[self.X] + d[self.DX] * d[self.SPEED])
+        d[self.Y] = rect_round(d[self.Y] + d[self.DY] * d[self.SPEED])
+
+    def boxes(self):
+        d = self.view()
+        b = np.empty((self.count, 4), np.int64)
+        b[:, 0], b[:, 1], b[:, 2], b[:, 3] = d[self.X], d[self.Y], self.W, self.H
+        return b
+
+    def on_screen(self):
+        x, y = self.data[self.X, :self.count], self.data[self.Y, :self.count]
+        return (-50 <= y) & (y <= HEIGHT + 50) & (-50 <= x) & (x <= WIDTH + 50)
+
+    def sprite(self, enemy):
+        # The old pair of draw.line calls (5 px glow, 2 px core) baked once: 5x21 from (x-2, top).
+        # Every pixel is solid, so it stays out of the alpha atlas as a plain opaque surface.
+        if enemy not in self.sprites:
+            s = pygame.Surface((5, self.H + 1)).convert()
+            pygame.draw.line(s, NEON_RED if enemy else NEON_BLUE, (2, 0), (2, self.H), 5)
+            pygame.draw.line(s, WHITE, (2, 0), (2, self.H), 2)
+            self.sprites[enemy] = s
+        return self.sprites[enemy]
+
+    def draw(self, surface, ox, oy, back=0.0):
+        # One blits() call, returns its length; positions floored as draw.line floored the line ends
+        d = self.view()
+        xs = np.floor(lerp_back(d, self.X, self.PX, back) + 3 + ox).astype(np.int64) - 2
+        ys = np.floor(lerp_back(d, self.Y, self.PY, back) + oy).astype(np.int64)
+        sprites = np.array([self.sprite(False), self.sprite(True)], object)[(d[self.ENEMY] > 0).view(np.int8)]
+        surface.blits(zip(sprites.tolist(), zip(xs.tolist(), ys.tolist())), doreturn=False)
+        return len(xs)
+
+class EnemyStore(EntityStore):
+    FIELDS = ("x", "y", "hp", "max_hp", "speed", "type", "start_x", "t", "px", "py")
+    X, Y, HP, MAX_HP, SPEED, TYPE, START_X, T, PX, PY = range(10)
+    STANDARD, KAMIKAZE, ACE = range(3)
+    TYPES = ("STANDARD", "KAMIKAZE", "ACE")
+    TINTS = (WHITE, NEON_RED, NEON_PURPLE)
+    FIRE_CHANCE = np.array([0.01, 0.0, 0.03]) # Per frame, by type
+    FIRE_PATTERNS = ("down", "down", "aimed")   # PATTERNS name, by type
+    SIZE = 50
+
+    def spawn(self, w, h, difficulty=1.0, rng=random, balance=DEFAULT_BALANCE):
+        x = rng.randint(50, w-50)
 
-    def draw(self, surface, ox, oy):
-        start = (self.rect.centerx + ox, self.rect.top + oy)
-        end = (self.rect.centerx + ox, self.rect.bottom + oy)
-        pygame.draw.line(surface, self.color, start, end, 5)
-        pygame.draw.line(surface, WHITE, start, end, 2)
-
-class Enemy(pygame.sprite.Sprite):
-    def __init__(self, w, h, difficulty=1.0):
-        super().__init__()
-        self.image = assets.load_image("enemy_plane.png", (50, 50))
-        self.rect = pygame.Rect(random.randint(50, w-50), -60, 50, 50)
-        
         # Determine Enemy Type based on randomness and difficulty
-        roll = random.random()
-        if roll < 0.2 and difficulty > 1.2:
-            self.type = "KAMIKAZE" # Fast, rams player
-            self.hp = 20 * difficulty
-            self.speed = 4 * difficulty
-            self.color_tint = NEON_RED
-        elif roll < 0.4 and difficulty > 1.5:
-            self.type = "ACE" # Aimed shots
-            self.hp = 60 * difficulty
-            self.speed = 2 * difficulty
-            self.color_tint = NEON_PURPLE
-        else:
-            self.type = "STANDARD"
-            self.hp = 30 * difficulty
-            self.speed = 3 * difficulty
-            self.color_tint = WHITE
-
-        self.max_hp = self.hp
-        self.start_x = self.rect.x
-        self.t = random.uniform(0, 360) 
-        
+        b = balance
+        roll = rng.random()
+        if roll < b.kamikaze_roll and difficulty > b.kamikaze_difficulty: kind = self.KAMIKAZE # Fast, rams player
+        elif roll < b.ace_roll and difficulty > b.ace_difficulty: kind = self.ACE # Aimed shots
+        else: kind = self.STANDARD
+        hp, speed = b.enemy_hp[kind] * difficulty, b.enemy_speed[kind] * difficulty
+
+        d = self.alloc(1)
+        d[:, 0] = (x, -60, hp, hp, speed, kind, x, rng.uniform(0, 360), x, -60)
+        return self.count - 1
+
+    def update(self, bullets, player_rect, rng):
+        # AI Behavior, one vectorized step per type (same maths as the old per-object branch)
+        d = self.view()
+        d[self.PX], d[self.PY] = d[self.X], d[self.Y]
+        x, y, speed, kind = d[self.X], d[self.Y], d[self.SPEED], d[self.TYPE]
+        px, py = player_rect.centerx, player_rect.centery
+
+        weave = kind == self.STANDARD
+        d[self.Y, weave] = rect_round(y[weave] + speed[weave])
+        d[self.T, weave] += 0.05
+        d[self.X, weave] = rect_round(d[self.START_X, weave] + np.sin(d[self.T, weave]) * 50)
+
+        # Kamikaze: move towards player aggressively
+        ram = kind == self.KAMIKAZE
+        angle = np.arctan2(py - (y[ram] + 25), px - (x[ram] + 25))
+        d[self.X, ram] = rect_round(x[ram] + np.cos(angle) * speed[ram])
+        d[self.Y, ram] = rect_round(y[ram] + np.sin(angle) * speed[ram])
+
+        ace = kind == self.ACE
+        d[self.Y, ace] = rect_round(y[ace] + speed[ace])
+
+        # Fire decisions for every enemy in one draw; each type fires its pattern from its centre
+        shooters = np.flatnonzero(rng.random(self.count) < self.FIRE_CHANCE[kind.astype(np.intp)])
+        if len(shooters):
+            kinds = kind[shooters]
+            groups = []
+            for k in np.unique(kinds).astype(int).tolist():
+                who = shooters[kinds == k]
+                groups.append((who, PATTERNS[self.FIRE_PATTERNS[k]], x[who] + 25, y[who] + 25, None))
+            fire(bullets, groups, px, py, lead=25)
+
+    def boxes(self):
+        d = self.view()
+        b = np.empty((self.count, 4), np.int64)
+        b[:, 0], b[:, 1], b[:, 2], b[:, 3] = d[self.X], d[self.Y], self.SIZE, self.SIZE
+        return b
+
+    def centers(self):
+        d = self.view()
+        return (d[self.X] + 25).astype(int).tolist(), (d[self.Y] + 25).astype(int).tolist()
+
+    def ring(self, kind):
+        # Pre-baked indicator for special enemies, centred in a 22px square
+        tint = self.TINTS[kind]
+        def make():
+            s = pygame.Surface((22, 22), pygame.SRCALPHA)
+            pygame.draw.circle(s, tint, (11, 11), 10, 2)
+            return s
+        return assets.baked(("ring", tint), make)
+
+    def draw(self, surface, ox, oy, back=0.0):
+        # Returns the number of blits issued (planes and KAMIKAZE/ACE rings)
+        plane = assets.sprite("enemy_plane.png", (50, 50))
+        d = self.view()
+        xs = (lerp_back(d, self.X, self.PX, back) + ox).tolist()
+        ys = (lerp_back(d, self.Y, self.PY, back) + oy).tolist()
+        kinds = d[self.TYPE].astype(int).tolist()
+        health = np.maximum(0, d[self.HP] / d[self.MAX_HP]).tolist()
+        if plane:
+            sheet, area = plane
+            batch = [(sheet, (x, y), area) for x, y in zip(xs, ys)]
+            rings = (None, self.ring(self.KAMIKAZE), self.ring(self.ACE))
+            for x, y, k in zip(xs, ys, kinds):
+                if k != self.STANDARD: batch.append((rings[k][0], (int(x+25) - 11, int(y+25) - 11), rings[k][1]))
+            surface.blits(batch, doreturn=False)
+        for x, y, kind, pct in zip(xs, ys, kinds, health):
+            tint = self.TINTS[kind]
+            if not plane: pygame.draw.rect(surface, tint, (x, y, 50, 50))
+            pygame.draw.rect(surface, tint, (x, y-5, 50*pct, 3))
+        return len(batch) if plane else 0
+
+class EmitterStore(EntityStore):
+    # Invisible muzzles for boss waves: each drifts by (vx, vy) and fires its pattern every
+    # `every` steps until its volleys run out or it drifts off screen
+    FIELDS = ("x", "y", "vx", "vy", "pattern", "angle", "timer", "volleys")
+    X, Y, VX, VY, PATTERN, ANGLE, TIMER, VOLLEYS = range(8)
+
+    def spawn(self, x, y, pattern, vx=0.0, vy=0.0, delay=0):
+        d = self.alloc(1)
+        d[:, 0] = (x, y, vx, vy, PATTERN_NAMES.index(pattern), 0.0, delay, PATTERNS[pattern].volleys)
+
     def update(self, bullets, player_rect):
-        # AI Behavior
-        if self.type == "STANDARD":
-            self.rect.y += self.speed
-            self.t += 0.05
-            self.rect.x = self.start_x + math.sin(self.t) * 50
-            # Shoot down
-            if random.random() < 0.01:
-                bullets.append(Bullet(self.rect.centerx, self.rect.bottom, is_enemy=True))
-
-        elif self.type == "KAMIKAZE":
-            # Move towards player aggressively
-            dx = player_rect.centerx - self.rect.centerx
-            dy = player_rect.centery - self.rect.centery
-            angle = math.atan2(dy, dx)
-            self.rect.x += math.cos(angle) * self.speed
-            self.rect.y += math.sin(angle) * self.speed
-
-        elif self.type == "ACE":
-            self.rect.y += self.speed
-            # Shoot aimed bullets
-            if random.random() < 0.03:
-                # Calculate vector to player
-                vec = pygame.Vector2(player_rect.centerx - self.rect.centerx, player_rect.centery - self.rect.centery)
-                if vec.length() > 0: vec = vec.normalize()
-                bullets.append(Bullet(self.rect.centerx, self.rect.bottom, direction=vec, is_enemy=True))
+        d = self.view()
+        d[self.X] += d[self.VX]
+        d[self.Y] += d[self.VY]
+        d[self.TIMER] -= 1
+        ready = np.flatnonzero(d[self.TIMER] <= 0)
+        if len(ready):
+            which = d[self.PATTERN, ready]
+            groups = []
+            for p in np.unique(which).astype(int).tolist():
+                idx = ready[which == p]
+                pat = PATTERNS[PATTERN_NAMES[p]]
+                groups.append((idx, pat, d[self.X, idx], d[self.Y, idx], d[self.ANGLE, idx]))
+                d[self.ANGLE, idx] += pat.spin
+                d[self.TIMER, idx] = pat.every
+                d[self.VOLLEYS, idx] -= 1
+            fire(bullets, groups, player_rect.centerx, player_rect.centery)
+        self.keep((d[self.VOLLEYS] > 0) & (-100 <= d[self.Y]) & (d[self.Y] <= HEIGHT + 50))
 
-    def draw(self, surface, ox, oy):
-        x, y = self.rect.x + ox, self.rect.y + oy
-        if self.image:
-            # Simple tinting by drawing a colored rect with multiply blend mode could go here
-            # But for simplicity, we just draw the image
-            surface.blit(self.image, (x, y))
-            # Draw an indicator for special enemies
-            if self.type != "STANDARD":
-                pygame.draw.circle(surface, self.color_tint, (int(x+25), int(y+25)), 10, 2)
-        else:
-            pygame.draw.rect(surface, self.color_tint, (x, y, 50, 50))
-            
-        pct = max(0, self.hp / self.max_hp)
-        pygame.draw.rect(surface, self.color_tint, (x, y-5, 50*pct, 3))
+class PowerUp:
+    __slots__ = ("rect", "type", "pulse", "alive")
+    TYPES = ("HP", "TRIPLE", "SHIELD", "SPEED", "BOMB")
+
+    def __init__(self):
+        self.rect = pygame.Rect(0, 0, 25, 25)
 
-class PowerUp(pygame.sprite.Sprite):
-    def __init__(self, x, y, p_type):
-        self.rect = pygame.Rect(x, y, 25, 25)
+    def spawn(self, x, y, p_type):
+        self.rect.update(x, y, 25, 25)
         self.type = p_type
         self.pulse = 0
+        self.alive = True
+
+    def live(self):
+        return self.alive and self.rect.y <= HEIGHT
         
     def update(self):
         self.rect.y += 2
         self.pulse += 0.2
         
-    def draw(self, surface, ox, oy):
-        size_off = math.sin(self.pulse) * 3
-        r = pygame.Rect(self.rect.x + ox - size_off, self.rect.y + oy - size_off, 25 + size_off*2, 25 + size_off*2)
-        
+    def icon(self, w, h):
         # Color Coding
         if self.type == "HP": color = NEON_GREEN
         elif self.type == "TRIPLE": color = NEON_ORANGE
@@ -220,16 +806,27 @@ class PowerUp(pygame.sprite.Sprite):
         elif self.type == "BOMB": color = NEON_RED
         else: color = WHITE
 
-        pygame.draw.rect(surface, color, r, border_radius=4)
-        pygame.draw.rect(surface, WHITE, r, 2, border_radius=4)
-        
-        # Simple Text Icon
-        # (Ideally use an icon image, but shapes work for code-only)
+        s = pygame.Surface((w, h), pygame.SRCALPHA)
+        pygame.draw.rect(s, color, (0, 0, w, h), border_radius=4)
+        pygame.draw.rect(s, WHITE, (0, 0, w, h), 2, border_radius=4)
+        return s
+
+    def sprite(self, ox, oy, back=0.0):
+        # Blits entry for the pulsing icon; each (type, size) is baked into the atlas once
+        oy -= 2 * back
+        size_off = math.sin(self.pulse - 0.2 * back) * 3
+        r = pygame.Rect(self.rect.x + ox - size_off, self.rect.y + oy - size_off, 25 + size_off*2, 25 + size_off*2)
+        sheet, area = assets.baked(("powerup", self.type, r.w, r.h), lambda: self.icon(r.w, r.h))
+        return sheet, r.topleft, area
+
+PowerUp.pool = Pool(PowerUp)
+Explosion.pool = Pool(Explosion)
 
 class Player:
     def __init__(self):
-        self.image = assets.load_image("plane.png", (64, 74))
+        self.image = assets.sprite("plane.png", (64, 74))
         self.rect = pygame.Rect(WIDTH//2, HEIGHT-100, 60, 70)
+        self.prev = self.rect.topleft # Position before the last step, for interpolation
         self.hp = 100
         self.max_hp = 100
         self.ammo = 50
@@ -246,6 +843,7 @@ class Player:
         self.speed_timer = 0
         
     def move(self, keys):
+        self.prev = self.rect.topleft
         # Base Speed
         speed = 12 if self.speed_timer > 0 else 7
         
@@ -276,7 +874,7 @@ class Player:
 
     def draw(self, surface, ox, oy):
         if self.image:
-            surface.blit(self.image, (self.rect.x + ox, self.rect.y + oy))
+            surface.blit(self.image[0], (self.rect.x + ox, self.rect.y + oy), self.image[1])
         else:
             pygame.draw.polygon(surface, NEON_BLUE, [
                 (self.rect.centerx+ox, self.rect.top+oy),
@@ -299,69 +897,987 @@ class Player:
         if self.reloading: ammo_pct = 1.0 - (self.reload_timer / 100)
         pygame.draw.rect(surface, col, (bar_x, bar_y, bar_w * ammo_pct, bar_h))
 
+# ---- Profiling ----
+# Named-span timer. While nothing listens it is a plain call. Listeners are frame hooks,
+# the rolling history (debug overlay) and trace captures; any of them switches timing on.
+# Durations are summed per span name until end_frame() closes the frame.
+class Profiler:
+    HISTORY = 120
+
+    def __init__(self):
+        self.enabled = False
+        self.current = {}
+        self.counts = {}
+        self.frame = 0
+        self.hooks = []
+        self.history = None  # {"update"|"draw"|"fps": ring of the last HISTORY frames}
+        self.trace_events = []
+        self.trace_left = 0
+
+    def sync(self):
+        self.enabled = bool(self.hooks) or self.history is not None or self.trace_left > 0
+
+    def run(self, name, fn, *args):
+        if not self.enabled: return fn(*args)
+        start = time.perf_counter()
+        result = fn(*args)
+        end = time.perf_counter()
+        self.current[name] = self.current.get(name, 0.0) + end - start
+        if self.trace_left:
+            self.trace_events.append({"name": name, "cat": name.split("/")[0], "ph": "X", "pid": 1, "tid": 1,
+                                      "ts": start * 1e6, "dur": (end - start) * 1e6})
+        return result
+
+    def count(self, name, n=1):
+        if self.enabled: self.counts[name] = self.counts.get(name, 0) + n
+
+    # -- Listeners --
+    def add_hook(self, fn):
+        # fn(stats) after every frame; stats = {"frame", "spans" (seconds), "counts", "fps"}
+        self.hooks.append(fn)
+        self.sync()
+
+    def remove_hook(self, fn):
+        self.hooks.remove(fn)
+        self.sync()
+
+    def keep_history(self, on):
+        self.history = {k: np.zeros(self.HISTORY) for k in ("update", "draw", "fps")} if on else None
+        self.sync()
+
+    def capture(self, frames):
+        # Record every span for the next `frames` frames as Chrome trace / Perfetto events
+        self.trace_events = []
+        self.trace_left = frames
+        self.sync()
+
+    def trace(self):
+        return {"traceEvents": self.trace_events, "displayTimeUnit": "ms"}
+
+    def save_trace(self, path):
+        import json
+        with open(path, "w") as f: json.dump(self.trace(), f)
+
+    def end_frame(self, counts=None, fps=0.0):
+        if counts: self.counts.update(counts)
+        stats = {"frame": self.frame, "spans": self.current, "counts": self.counts, "fps": fps}
+        if self.history is not None:
+            i = self.frame % self.HISTORY
+            self.history["update"][i] = self.current.get("update", 0.0) * 1000
+            self.history["draw"][i] = self.current.get("draw", 0.0) * 1000
+            self.history["fps"][i] = fps
+        if self.trace_left:
+            ts = time.perf_counter() * 1e6
+            self.trace_events.append({"name": "entities", "ph": "C", "pid": 1, "ts": ts, "args": dict(self.counts)})
+            self.trace_left -= 1
+            if not self.trace_left: self.sync()
+        for hook in self.hooks: hook(stats)
+        self.frame += 1
+        self.current, self.counts = {}, {}
+        return stats
+
+class PerfOverlay:
+    # F3 debug panel: update/draw frame-time graphs, FPS history, entity and blit counts
+    RECT = pygame.Rect(10, HEIGHT - 170, 250, 160)
+    SCALE_MS = 33.3  # graph height = two 60 FPS frames
+
+    def __init__(self, font):
+        self.font = font
+        self.panel = pygame.Surface(self.RECT.size, pygame.SRCALPHA)
+
+    def graph(self, surface, values, start, color, top):
+        # Oldest sample on the left; values come from a ring whose newest entry is start - 1
+        r = self.RECT
+        n = len(values)
+        pts = [(r.x + 5 + k * (r.w - 10) / (n - 1),
+                top - min(values[(start + k) % n], self.SCALE_MS) / self.SCALE_MS * 60) for k in range(n)]
+        pygame.draw.lines(surface, color, False, pts, 1)
+
+    def draw(self, surface, profiler, counts, quality=""):
+        h = profiler.history
+        if h is None: return
+        r = self.RECT
+        self.panel.fill((0, 0, 0, 170))
+        surface.blit(self.panel, r.topleft)
+        base = r.y + 70
+        budget = base - (1000 / FPS) / self.SCALE_MS * 60
+        pygame.draw.line(surface, (90, 90, 90), (r.x + 5, budget), (r.right - 5, budget))
+        start = profiler.frame % profiler.HISTORY
+        self.graph(surface, h["update"], start, NEON_CYAN, base)
+        self.graph(surface, h["draw"], start, NEON_ORANGE, base)
+        self.graph(surface, h["fps"] * (self.SCALE_MS / 120), start, NEON_GREEN, base)
+        last = (start - 1) % profiler.HISTORY
+        lines = (
+            (f"UPDATE {h['update'][last]:5.2f}ms  DRAW {h['draw'][last]:5.2f}ms", WHITE),
+            (f"FPS {h['fps'][last]:5.1f}  BLITS {counts.get('blits', 0)}", NEON_GREEN),
+            (f"BUL {counts['bullets']}  ENE {counts['enemies']}  PAR {counts['particles']}", WHITE),
+            (f"EXP {counts['explosions']}  PWR {counts['powerups']}  Q {quality.upper()}", WHITE),
+        )
+        for k, (text, color) in enumerate(lines):
+            surface.blit(self.font.render(text, True, color), (r.x + 6, base + 6 + k * 20))
+
+class StartupTimeline:
+    # Milestones of a cold start in ms since BOOT (module import), up to the first frame on
+    # screen; report() formats them, printed by the frame loop only when verbose (--startup)
+    def __init__(self, verbose=False):
+        self.marks = []
+        self.done = False
+        self.verbose = verbose
+
+    def mark(self, name):
+        self.marks.append((name, (time.perf_counter() - BOOT) * 1000))
+
+    def finish(self, name="first frame"):
+        self.mark(name)
+        self.done = True
+        if self.verbose: print("startup:", self.report())
+
+    def report(self):
+        steps, last = [], 0.0
+        for name, ms in self.marks:
+            steps.append(f"{name} +{ms - last:.0f}")
+            last = ms
+        return ", ".join(steps) + f" = {last:.0f} ms"
+
+startup = StartupTimeline()
+
+# ---- Quality Governor ----
+class QualityGovernor:
+    # Steps visual cost down a tier when frames run over budget and back up when there is
+    # headroom. Frame times are averaged over windows; dropping takes down_windows over-budget
+    # windows in a row, rising takes up_windows windows under headroom * budget, and anything
+    # in between holds the tier, so it settles instead of flapping.
+    TIERS = (  # name, trail (emit every n steps, 0 = off), glow alpha, explosion detail, clouds, shake
+        ("high", 1, 100, 2, 4, True),
+        ("medium", 2, 80, 2, 2, True),
+        ("low", 3, 60, 1, 1, False),
+        ("minimal", 0, 0, 0, 0, False),
+    )
+    FIELDS = ("name", "trail", "glow", "explosions", "clouds", "shake")
+
+    def __init__(self, budget_ms=1000 / FPS * 0.8, window=30, down_windows=2, up_windows=6, headroom=0.6):
+        self.budget_ms = budget_ms # Work per frame, leaving the rest of the vsync interval to the browser
+        self.window = window
+        self.down_windows = down_windows
+        self.up_windows = up_windows
+        self.headroom = headroom
+        self.auto = True
+        self.total = 0.0
+        self.samples = 0
+        self.window_ms = 0.0 # Mean of the last full window
+        self.over = self.under = 0
+        self.changes = 0
+        self.set_tier(0)
+
+    def set_tier(self, tier):
+        self.tier = tier
+        for field, value in zip(self.FIELDS, self.TIERS[tier]): setattr(self, field, value)
+        self.over = self.under = 0
+        self.changes += 1
+
+    def lock(self, name=None):
+        # Pin a tier by name, or None to go back to automatic
+        self.auto = name is None
+        if name is not None: self.set_tier([t[0] for t in self.TIERS].index(name))
+
+    def observe(self, ms):
+        # Feed one frame's work time; returns True when the tier changed
+        if not self.auto: return False
+        self.total += ms
+        self.samples += 1
+        if self.samples < self.window: return False
+        self.window_ms = self.total / self.samples
+        self.total, self.samples = 0.0, 0
+        if self.window_ms > self.budget_ms: self.over, self.under = self.over + 1, 0
+        elif self.window_ms < self.budget_ms * self.headroom: self.over, self.under = 0, self.under + 1
+        else: self.over = self.under = 0
+        if self.over >= self.down_windows and self.tier < len(self.TIERS) - 1: self.set_tier(self.tier + 1)
+        elif self.under >= self.up_windows and self.tier > 0: self.set_tier(self.tier - 1)
+        else: return False
+        return True
+
+    def stats(self):
+        return {"tier": self.tier, "auto": self.auto, "budget_ms": self.budget_ms, "window_ms": self.window_ms,
+                "changes": self.changes - 1, **{f: getattr(self, f) for f in self.FIELDS}}
+
+# ---- Parallax Background ----
+class ParallaxLayer:
+    # Scrolling layer pre-composited into a wrap-around strip: one period of pattern plus a
+    # screen width (and a shake margin each side) of repeat, so whatever is on screen is a
+    # single sub-rect of the strip. The strip is cut into horizontal bands: fully transparent
+    # rows are dropped and fully opaque rows are blitted without per-pixel alpha.
+    MARGIN = 32  # >= the strongest screen shake
+
+    def __init__(self, pieces, period, y):
+        # pieces: (surface, x, y) placed within one period
+        self.period = int(period)
+        h = max(py + s.get_height() for s, _, py in pieces)
+        strip = pygame.Surface((self.period + WIDTH + 2 * self.MARGIN, h), pygame.SRCALPHA)
+        for k in range(-1, WIDTH // self.period + 2):
+            for s, x, py in pieces: strip.blit(s, (self.MARGIN + x + k * self.period, py), special_flags=pygame.BLEND_RGBA_MAX)
+        alpha = pygame.surfarray.array_alpha(strip)
+        # Row class: 0 = empty, 1 = mixed, 2 = opaque
+        kind = np.where(alpha.min(axis=0) == 255, 2, (alpha.max(axis=0) > 0).astype(int))
+        self.bands = []  # (surface, screen y)
+        top = 0
+        for row in range(1, h + 1):
+            if row < h and kind[row] == kind[top]: continue
+            if kind[top]:
+                band = strip.subsurface((0, top, strip.get_width(), row - top))
+                if kind[top] == 2: band = band.convert()
+                else:
+                    band = band.convert_alpha()
+                    band.set_alpha(255, pygame.RLEACCEL) # RLE blits skip the transparent runs
+                self.bands.append((band, y + top))
+            top = row
+
+    def draw(self, surface, scroll, ox, oy):
+        # Screen x = strip x - off, where off puts the pattern at `scroll` (mod period)
+        ox = max(-self.MARGIN, min(self.MARGIN, int(ox)))
+        off = -math.floor(scroll) % self.period + self.MARGIN - ox
+        surface.blits([(band, (0, y + oy), (off, 0, WIDTH, band.get_height())) for band, y in self.bands], doreturn=False)
+        return len(self.bands)
+
+class Parallax:
+    # Background stack. Static layers are flattened into one opaque base surface at build time,
+    # moving layers are strips drawn back to front; with no static art the base is a flat fill.
+    def __init__(self, color):
+        self.color = color
+        self.base = None
+        self.layers = {}  # name -> ParallaxLayer, in draw order
+
+    def add(self, name, pieces, period=None, y=0):
+        if period is None:
+            if self.base is None:
+                self.base = pygame.Surface((WIDTH, HEIGHT)).convert()
+                self.base.fill(self.color)
+            for s, x, py in pieces: self.base.blit(s, (x, y + py))
+        else: self.layers[name] = ParallaxLayer(pieces, period, y) if pieces else None # None keeps the slot
+
+    def draw(self, surface, scrolls, ox, oy):
+        # Returns the number of blits issued
+        if self.base: surface.blit(self.base, (ox, oy))
+        else: surface.fill(self.color)
+        blits = bool(self.base)
+        for name, layer in self.layers.items():
+            if layer: blits += layer.draw(surface, scrolls[name], ox, oy)
+        return blits
+
+# ---- HUD ----
+class TextCache:
+    # Rendered strings keyed by (text, color). HUD text repeats frame after frame, and
+    # font.render is one of the slowest calls in the browser build.
+    def __init__(self, font, limit=256):
+        self.font = font
+        self.limit = limit
+        self.surfaces = {}
+
+    def render(self, text, color):
+        key = (text, color)
+        s = self.surfaces.get(key)
+        if s is None:
+            if len(self.surfaces) >= self.limit: self.surfaces.clear()
+            s = self.surfaces[key] = self.font.render(text, True, color)
+        return s
+
+class Hud:
+    # Cached HUD layer. Static labels render once, dynamic strings only when their value
+    # changes, and the top-left panel (backdrop, shield bar) is one composited surface. Text is
+    # blitted straight to the screen: antialiased onto a translucent panel it would blend twice.
+    def __init__(self, font, big_font):
+        self.text = TextCache(font)
+        self.big = TextCache(big_font)
+        self.panel = self.panel_key = None
+        self.score = self.score_key = None
+        self.banner = None
+
+    def build_panel(self, hp):
+        s = pygame.Surface((220, 60), pygame.SRCALPHA)
+        s.fill((*BLACK, 120))
+        pygame.draw.rect(s, NEON_RED, (5, 15, 200 * (hp/100), 10), border_radius=5)
+        return s
+
+    def build_banner(self):
+        s = pygame.Surface((WIDTH, 120), pygame.SRCALPHA)
+        s.fill((*BLACK, 200))
+        return s
+
+    def draw(self, surface, game):
+        # Returns the number of blits issued
+        p = game.player
+        if p.hp != self.panel_key: self.panel, self.panel_key = self.build_panel(p.hp), p.hp
+        key = (int(p.score), f"{game.difficulty:.1f}")
+        if key != self.score_key:
+            self.score = (self.big.render(f"{key[0]:06d}", NEON_BLUE), self.text.render(f"THREAT LEVEL: {key[1]}", NEON_RED))
+            self.score_key = key
+        score_txt, diff_txt = self.score
+        x = WIDTH - score_txt.get_width() - 20
+        batch = [(self.panel, (10, 10)), (self.text.render("SHIELD INTEGRITY", WHITE), (15, 10)),
+                 (score_txt, (x, 10)), (diff_txt, (x, 50)),
+                 (self.text.render(f"BOMBS: {p.bombs} [B]", NEON_ORANGE), (15, 45))]
+
+        # Active Powerup Text
+        if p.shield_timer > 0: batch.append((self.text.render("SHIELD ACTIVE", NEON_CYAN), (WIDTH//2 - 50, HEIGHT - 80)))
+        if p.speed_timer > 0: batch.append((self.text.render("SPEED BOOST", NEON_YELLOW), (WIDTH//2 - 50, HEIGHT - 60)))
+
+        if game.game_over:
+            if self.banner is None: self.banner = self.build_banner()
+            go_txt = self.big.render("MISSION FAILED", NEON_RED)
+            re_txt = self.text.render("PRESS R TO RESTART", WHITE)
+            batch += [(self.banner, (0, HEIGHT//2 - 60)),
+                      (go_txt, (WIDTH//2 - go_txt.get_width()//2, HEIGHT//2 - 20)),
+                      (re_txt, (WIDTH//2 - re_txt.get_width()//2, HEIGHT//2 + 30))]
+        surface.blits(batch, doreturn=False)
+        return len(batch)
+
+# ---- Input ----
+# Game.update reads input through a controller: poll(game) returns anything indexable by
+# pygame key constants, like the ScancodeWrapper from pygame.key.get_pressed().
+class InputState:
+    def __init__(self, pressed=()):
+        self.pressed = set(pressed)
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+class KeyboardController:
+    def poll(self, game):
+        return pygame.key.get_pressed()
+
+class AutoPilot:
+    # Scripted policy for headless runs: chase the nearest enemy, keep firing, bomb when swarmed
+    def poll(self, game):
+        if game.game_over: return InputState((pygame.K_r,))
+        keys = [pygame.K_SPACE]
+        p = game.player.rect
+        if len(game.enemies):
+            xs = game.enemies.view()[EnemyStore.X] + 25
+            target = xs[np.argmin(np.abs(xs - p.centerx))]
+            if target < p.centerx - 8: keys.append(pygame.K_LEFT)
+            elif target > p.centerx + 8: keys.append(pygame.K_RIGHT)
+        if p.bottom < HEIGHT - 40: keys.append(pygame.K_DOWN)
+        if len(game.enemies) > 8 or game.player.hp <= 30: keys.append(pygame.K_b)
+        return InputState(keys)
+
+# ---- Replays ----
+# A replay is the seed plus one input byte per frame; any run with the same seed and bytes
+# is the same game. File: header, periodic state hashes (u32), then the zlib'd input bytes.
+INPUT_BITS = (  # bit -> keys that set it (first one is what playback presses)
+    (pygame.K_LEFT, pygame.K_a), (pygame.K_RIGHT, pygame.K_d), (pygame.K_UP, pygame.K_w),
+    (pygame.K_DOWN, pygame.K_s), (pygame.K_SPACE,), (pygame.K_b,), (pygame.K_r,),
+)
+
+def input_mask(keys):
+    mask = 0
+    for bit, group in enumerate(INPUT_BITS):
+        if any(keys[k] for k in group): mask |= 1 << bit
+    return mask
+
+def mask_input(mask):
+    return InputState(group[0] for bit, group in enumerate(INPUT_BITS) if mask >> bit & 1)
+
+class ReplayError(Exception):
+    pass
+
+class Recorder:
+    # Controller wrapper: passes input through and logs it, hashing the state every hash_every frames
+    MAGIC, VERSION = b"SFRP", 3  # v2: enemy fire drawn in bulk from Game.np_rng; v3: balance preset
+    HEADER = struct.Struct("<4sHIIHIB")  # magic, version, seed, frames, hash_every, hash count, PRESETS index
+
+    def __init__(self, controller, hash_every=FPS):
+        self.controller = controller
+        self.hash_every = hash_every
+        self.inputs = bytearray()
+        self.hashes = array.array("I")
+        self.seed = None
+        self.balance = DEFAULT_BALANCE
+
+    def poll(self, game):
+        if self.seed is None: self.seed, self.balance = game.seed, game.balance
+        if len(self.inputs) % self.hash_every == 0: self.hashes.append(game.state_hash())
+        keys = self.controller.poll(game)
+        self.inputs.append(input_mask(keys))
+        return keys
+
+    def to_bytes(self):
+        if self.balance not in PRESETS: raise ReplayError("only preset balances can be recorded")
+        return (self.HEADER.pack(self.MAGIC, self.VERSION, self.seed or 0, len(self.inputs), self.hash_every, len(self.hashes),
+                                 PRESETS.index(self.balance))
+                + self.hashes.tobytes() + zlib.compress(bytes(self.inputs), 9))
+
+    def save(self, path):
+        with open(path, "wb") as f: f.write(self.to_bytes())
+
+class Replay:
+    # Controller that plays a recording back and checks its state hashes on the way
+    def __init__(self, data):
+        magic, version, self.seed, frames, self.hash_every, n, preset = Recorder.HEADER.unpack_from(data)
+        if magic != Recorder.MAGIC or version != Recorder.VERSION:
+            raise ReplayError(f"not a v{Recorder.VERSION} Sky Force replay")
+        if preset >= len(PRESETS): raise ReplayError(f"unknown balance preset {preset}")
+        self.balance = PRESETS[preset]
+        body = Recorder.HEADER.size
+        self.hashes = array.array("I", data[body:body + 4 * n])
+        self.inputs = zlib.decompress(data[body + 4 * n:])
+        if len(self.inputs) != frames: raise ReplayError("truncated replay")
+        self.frame = 0
+        self.checked = 0
+        self.diverged_at = None  # first frame whose state hash disagreed
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f: return cls(f.read())
+
+    @property
+    def done(self):
+        return self.frame >= len(self.inputs)
+
+    def poll(self, game):
+        if self.done: return InputState()
+        if self.frame % self.hash_every == 0:
+            k = self.frame // self.hash_every
+            if game.state_hash() != self.hashes[k] and self.diverged_at is None: self.diverged_at = self.frame
+            self.checked += 1
+        self.frame += 1
+        return mask_input(self.inputs[self.frame - 1])
+
+# ---- Snapshots ----
+# Game.snapshot() -> bytes: header, typed scalars (player, game, shake, RNG odds and ends), the
+# two Mersenne Twister and two PCG64 states, then the entity stores, explosions, power-ups and
+# the particle palette. Only numbers are stored; nothing is pickled.
+SNAPSHOT_MAGIC = b"SFSS"
+SNAPSHOT_VERSION = 3
+PLAYER_STATE = ("hp", "max_hp", "ammo", "max_ammo", "score", "bombs", "reloading", "reload_timer",
+                "triple_shot", "shield_timer", "speed_timer")
+GAME_STATE = ("seed", "difficulty", "game_over", "city_scroll", "cloud_scroll", "damage_taken", "kills", "f3_held", "steps")
+SCALAR_CODES = {float: b"f", int: b"i", bool: b"b", type(None): b"n"}
+SCALAR_TYPES = {ord("f"): float, ord("i"): int, ord("b"): bool, ord("n"): lambda v: None}
+
+def pack_scalars(values):
+    # One type code per value (so ints, bools and None come back as themselves), then doubles
+    codes = b"".join(SCALAR_CODES.get(type(v), b"f") for v in values)
+    return struct.pack("<H", len(values)) + codes + struct.pack(f"<{len(values)}d", *[v or 0.0 for v in values])
+
+def unpack_scalars(buf, at):
+    n, = struct.unpack_from("<H", buf, at)
+    codes = bytes(buf[at + 2:at + 2 + n])
+    values = struct.unpack_from(f"<{n}d", buf, at + 2 + n)
+    return [SCALAR_TYPES[c](v) for c, v in zip(codes, values)], at + 2 + 9 * n
+
+MT_WORDS = struct.Struct("<625I") # random.Random state; its gauss_next goes in the scalars
+
+def pack_mt(state):
+    return MT_WORDS.pack(*state[1])
+
+def unpack_mt(buf, at, gauss):
+    return (3, MT_WORDS.unpack_from(buf, at), gauss), at + MT_WORDS.size
+
+def pack_pcg(state):
+    s = state["state"]
+    return s["state"].to_bytes(16, "little") + s["inc"].to_bytes(16, "little")
+
+def unpack_pcg(buf, at, has_uint32, uinteger):
+    return {"bit_generator": "PCG64", "has_uint32": has_uint32, "uinteger": uinteger,
+            "state": {"state": int.from_bytes(buf[at:at + 16], "little"),
+                      "inc": int.from_bytes(buf[at + 16:at + 32], "little")}}, at + 32
+
+def pack_rows(rows, width):
+    a = np.array(rows, np.float64).reshape(-1, width)
+    return struct.pack("<I", len(a)) + a.tobytes()
+
+def unpack_rows(buf, at, width):
+    n, = struct.unpack_from("<I", buf, at)
+    return np.frombuffer(buf, np.float64, n * width, at + 4).reshape(n, width).tolist(), at + 4 + 8 * n * width
+
+# ---- Frame Capture ----
+def png_bytes(rgb):
+    # (h, w, 3) uint8 -> PNG file bytes: Sub-filtered rows, fast zlib (which runs without the GIL)
+    h, w, _ = rgb.shape
+    rows = np.empty((h, w * 3 + 1), np.uint8)
+    rows[:, 0] = 1 # Sub filter: each byte minus the one a pixel to its left
+    line = rgb.reshape(h, w * 3)
+    rows[:, 1:4] = line[:, :3]
+    np.subtract(line[:, 3:], line[:, :-3], out=rows[:, 4:])
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+    return b"".join((b"\x89PNG\r\n\x1a\n", chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0)),
+                     chunk(b"IDAT", zlib.compress(rows.tobytes(), 1)), chunk(b"IEND", b"")))
+
+class FrameCapture:
+    # Records rendered frames without making the loop wait on disk. grab() copies the
+    # surface's pixel buffer into a free slot of a preallocated ring (one memcpy); a writer
+    # thread turns slots into RGB and writes them in order:
+    #   fmt "png": <out>/frame_000000.png, ... (numbered by written frame)
+    #   fmt "raw": <out>/frames.rgb, rgb24 frames back to back, described by frames.json:
+    #              ffmpeg -f rawvideo -pix_fmt rgb24 -s 800x600 -r 60 -i frames.rgb out.mp4
+    # With the ring full, policy "drop" skips the new frame and "wait" blocks until a slot
+    # frees up (offline runs, where every frame matters). Under emscripten there are no
+    # threads, so frames are written inline.
+    FORMATS = ("png", "raw")
+    POLICIES = ("drop", "wait")
+
+    def __init__(self, out, fmt="png", slots=8, policy="drop", fps=FPS):
+        if fmt not in self.FORMATS: raise ValueError(f"unknown capture format {fmt!r}")
+        if policy not in self.POLICIES: raise ValueError(f"unknown drop policy {policy!r}")
+        os.makedirs(out, exist_ok=True)
+        self.out, self.fmt, self.policy, self.fps = out, fmt, policy, fps
+        self.nslots = slots
+        self.ring = None # (slots, pitch * height) bytes, sized by the first frame
+        self.layout = None
+        self.free = queue.Queue()
+        self.filled = queue.Queue()
+        self.video = open(os.path.join(out, "frames.rgb"), "wb") if fmt == "raw" else None
+        self.captured = self.dropped = self.written = self.bytes = 0
+        self.encode_time = 0.0
+        self.thread = None
+        if sys.platform != "emscripten":
+            self.thread = threading.Thread(target=self.writer, name="frame-capture", daemon=True)
+            self.thread.start()
+
+    def setup(self, surface):
+        # Where R, G and B sit inside each pixel, so the writer can unpack the raw bytes
+        bpp = surface.get_bytesize()
+        if bpp not in (3, 4): raise ValueError(f"can't capture {bpp * 8}-bit surfaces")
+        w, h = surface.get_size()
+        order = [shift // 8 for shift in surface.get_shifts()[:3]]
+        self.layout = (w, h, surface.get_pitch(), bpp, order)
+        self.ring = np.empty((self.nslots, surface.get_pitch() * h), np.uint8)
+        for i in range(self.nslots): self.free.put(i)
+
+    def grab(self, surface):
+        if self.ring is None: self.setup(surface)
+        try: slot = self.free.get(self.policy == "wait" and self.thread is not None)
+        except queue.Empty:
+            self.dropped += 1
+            return
+        self.ring[slot] = np.frombuffer(surface.get_buffer(), np.uint8)
+        self.captured += 1
+        if self.thread: self.filled.put(slot)
+        else: self.encode(slot)
+
+    def rgb(self, slot):
+        w, h, pitch, bpp, order = self.layout
+        return self.ring[slot].reshape(h, pitch)[:, :w * bpp].reshape(h, w, bpp)[:, :, order]
+
+    def encode(self, slot):
+        start = time.perf_counter()
+        rgb = self.rgb(slot)
+        self.free.put(slot) # Pixels are out of the ring now
+        if self.video:
+            data = rgb.tobytes()
+            self.video.write(data)
+        else:
+            data = png_bytes(rgb)
+            with open(os.path.join(self.out, f"frame_{self.written:06d}.png"), "wb") as f: f.write(data)
+        self.written += 1
+        self.bytes += len(data)
+        self.encode_time += time.perf_counter() - start
+
+    def writer(self):
+        while True:
+            slot = self.filled.get()
+            if slot is None: return
+            self.encode(slot)
+
+    def close(self):
+        # Flush everything still queued; returns stats()
+        if self.thread:
+            self.filled.put(None)
+            self.thread.join()
+            self.thread = None
+        if self.video:
+            import json
+            self.video.close()
+            self.video = None
+            w, h = self.layout[:2] if self.layout else (0, 0)
+            with open(os.path.join(self.out, "frames.json"), "w") as f:
+                json.dump({"width": w, "height": h, "fps": self.fps, "pix_fmt": "rgb24", "frames": self.written}, f)
+        return self.stats()
+
+    def stats(self):
+        return {"captured": self.captured, "dropped": self.dropped, "written": self.written,
+                "queued": self.filled.qsize(), "bytes": self.bytes,
+                "encode_ms": self.encode_time / self.written * 1000 if self.written else 0.0}
+
+# ---- Telemetry ----
+TELEMETRY_MAGIC = b"SFTL"
+TELEMETRY_VERSION = 1
+
+class Telemetry:
+    # Gameplay event bus. Each enabled event name is a True attribute (tel.bomb_used ...) that
+    # hooks test before building a payload, so a disabled category costs one attribute read.
+    # Events are fixed-size records (step, event, up to three numbers) in preallocated
+    # buffers; a full buffer, flush_every frames or close() hands it to a writer thread
+    # and recording carries on in a free one (all busy: the event is dropped and counted).
+    # The log is JSONL when the path ends in .jsonl, one schema line then one object per
+    # event; otherwise binary: magic, version, schema JSON, then raw records (see load()).
+    EVENTS = {  # name -> payload fields
+        "game_started": ("seed",),
+        "enemy_spawned": ("type", "x"),     # EnemyStore.TYPES index
+        "enemy_killed": ("type", "x", "y"),
+        "bullet_hit": ("target", "x", "y"), # TARGETS index
+        "player_damaged": ("amount", "hp", "source"), # SOURCES index
+        "powerup_collected": ("type",),     # PowerUp.TYPES index
+        "bomb_used": ("cleared", "bombs_left"),
+        "difficulty_changed": ("difficulty",),
+        "game_over": ("score", "kills", "damage_taken"),
+    }
+    NAMES = tuple(EVENTS)
+    CODES = {name: i for i, name in enumerate(NAMES)}
+    TARGETS = ("enemy", "player", "shield")
+    SOURCES = ("bullet", "ram")
+    RECORD = np.dtype([("step", "<u4"), ("event", "u1"), ("a", "<f8"), ("b", "<f8"), ("c", "<f8")])
+
+    def __init__(self, path=None, events=None, capacity=4096, buffers=4, flush_every=FPS * 5):
+        # events: names to record (default: all); without a path nothing is recorded
+        for name in self.NAMES: setattr(self, name, False)
+        self.path = path
+        self.events = self.dropped = self.written = self.batches = 0
+        self.thread = None
+        if not path: return
+        events = self.NAMES if events is None else events
+        unknown = set(events) - set(self.NAMES)
+        if unknown: raise ValueError(f"unknown telemetry event(s): {', '.join(sorted(unknown))}")
+        for name in events: setattr(self, name, True)
+        self.jsonl = path.endswith(".jsonl")
+        self.flush_every = flush_every
+        self.frames = 0
+        self.buffers = [np.zeros(capacity, self.RECORD) for _ in range(buffers)]
+        self.free = queue.Queue()
+        for i in range(1, buffers): self.free.put(i)
+        self.current, self.n = 0, 0
+        self.full = queue.Queue()
+        self.file = open(path, "w" if self.jsonl else "wb")
+        self.write_header()
+        if sys.platform != "emscripten":
+            self.thread = threading.Thread(target=self.writer, name="telemetry", daemon=True)
+            self.thread.start()
+
+    def schema(self):
+        return {"events": self.EVENTS, "enemy_types": EnemyStore.TYPES, "powerup_types": PowerUp.TYPES,
+                "targets": self.TARGETS, "sources": self.SOURCES}
+
+    def write_header(self):
+        import json
+        if self.jsonl:
+            self.file.write(json.dumps({"schema": self.schema()}) + "\n")
+        else:
+            meta = json.dumps({**self.schema(), "record": self.RECORD.descr}).encode()
+            self.file.write(TELEMETRY_MAGIC + struct.pack("<HI", TELEMETRY_VERSION, len(meta)) + meta)
+
+    def emit(self, name, step, a=0.0, b=0.0, c=0.0):
+        if self.n == len(self.buffers[self.current]) and not self.swap():
+            self.dropped += 1
+            return
+        self.buffers[self.current][self.n] = (step, self.CODES[name], a, b, c)
+        self.n += 1
+        self.events += 1
+
+    def swap(self):
+        # Hand the current buffer to the writer; False if no free buffer is left
+        try: nxt = self.free.get_nowait()
+        except queue.Empty: return False
+        batch = (self.current, self.n)
+        self.current, self.n = nxt, 0
+        if self.thread: self.full.put(batch)
+        else: self.write(*batch)
+        return True
+
+    def end_frame(self):
+        if not self.path: return
+        self.frames += 1
+        if self.frames >= self.flush_every and self.n:
+            self.frames = 0
+            self.swap()
+
+    def write(self, i, n):
+        import json
+        rows = self.buffers[i][:n]
+        if self.jsonl:
+            fields = self.EVENTS
+            lines = []
+            for step, code, *values in rows.tolist():
+                name = self.NAMES[code]
+                values = [int(v) if v.is_integer() else v for v in values] # Codes and counts as ints
+                lines.append(json.dumps({"step": step, "event": name, **dict(zip(fields[name], values))},
+                                        separators=(",", ":")))
+            if lines: self.file.write("\n".join(lines) + "\n")
+        else:
+            self.file.write(rows.tobytes())
+        self.written += n
+        self.batches += 1
+        self.free.put(i)
+
+    def writer(self):
+        while True:
+            batch = self.full.get()
+            if batch is None: return
+            self.write(*batch)
+
+    def close(self):
+        # Write out everything recorded so far; returns stats()
+        if not self.path: return self.stats()
+        for name in self.NAMES: setattr(self, name, False)
+        if self.n:
+            batch = (self.current, self.n)
+            self.n = 0
+            if self.thread: self.full.put(batch)
+            else: self.write(*batch)
+        if self.thread:
+            self.full.put(None)
+            self.thread.join()
+            self.thread = None
+        if not self.file.closed: self.file.close()
+        return self.stats()
+
+    def stats(self):
+        return {"events": self.events, "written": self.written, "dropped": self.dropped, "batches": self.batches}
+
+    @staticmethod
+    def load(path):
+        # Binary log -> (schema, structured array of RECORD); use NAMES / schema to decode
+        import json
+        with open(path, "rb") as f: buf = f.read()
+        if buf[:4] != TELEMETRY_MAGIC: raise ValueError("not a telemetry log")
+        version, size = struct.unpack_from("<HI", buf, 4)
+        if version != TELEMETRY_VERSION: raise ValueError(f"unsupported telemetry version {version}")
+        schema = json.loads(buf[10:10 + size])
+        return schema, np.frombuffer(buf, Telemetry.RECORD, offset=10 + size)
+
 # ---- Main Engine ----
 class Game:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
-        pygame.display.set_caption("Sky Force: WASM")
+    def __init__(self, headless=False, seed=None, controller=None, balance=None, telemetry=None):
+        self.headless = headless
+        self.balance = balance or DEFAULT_BALANCE
+        self.telemetry = telemetry or Telemetry() # Default records nothing
+        if headless:
+            # Off-screen target; a 1x1 (dummy driver) display only exists so convert_alpha() works
+            if not pygame.display.get_surface(): pygame.display.set_mode((1, 1))
+            # Drawn straight into a numpy buffer: readers take views of self.pixels without
+            # locking the surface. BGRA is the display's own byte order, so blits stay fast.
+            self.pixels = np.zeros((HEIGHT, WIDTH, 4), np.uint8)
+            self.screen = pygame.image.frombuffer(self.pixels, (WIDTH, HEIGHT), "BGRA")
+        else:
+            self.pixels = None
+            self.screen = pygame.display.get_surface() # Opened by the loading screen
+            if not self.screen or self.screen.get_size() != (WIDTH, HEIGHT):
+                self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+            pygame.display.set_caption("Sky Force: WASM")
+        self.controller = controller or (AutoPilot() if headless else KeyboardController())
+        self.profiler = Profiler()
+        self.overlay = None
+        self.capture = None # FrameCapture fed by draw()
+        self.f3_held = False
         self.clock = pygame.time.Clock()
-        self.font = pygame.font.SysFont("arial", 16, bold=True)
-        self.big_font = pygame.font.SysFont("arial", 40, bold=True)
+        self.font = assets.font(16)
+        self.big_font = assets.font(40)
+        self.hud = Hud(self.font, self.big_font)
+        self.quality = QualityGovernor()
         
-        self.bg_img = assets.load_image("background_night.png", (WIDTH, HEIGHT))
+        self.background = Parallax((20, 20, 40))
+        bg_img = assets.load_image("background_night.png", (WIDTH, HEIGHT), opaque=True)
         self.cloud_img = assets.load_image("cloud.png", (200, 100))
-        self.city_img = assets.load_image("city.png", (WIDTH, 300))
+        city_img = assets.load_image("city.png", (WIDTH, 300))
+        if bg_img: self.background.add("sky", [(bg_img, 0, 0)])
+        self.clouds_shown = 4
+        if self.cloud_img: self.background.add("clouds", self.cloud_pieces(4), WIDTH + 200, 100)
+        if city_img: self.background.add("city", [(city_img, 0, 0)], city_img.get_width(), HEIGHT - 300)
         
+        self.bullets = BulletStore(256)
+        self.enemies = EnemyStore()
+        self.emitters = EmitterStore(16)
+        self.explosions = []
+        self.powerups = []
+        self.new_game(seed)
+
+    def new_game(self, seed=None):
+        # Fresh run on a new seed, keeping the window, fonts and caches
+        self.seed = seed if seed is not None else random.randrange(1 << 32)
+        self.rng = random.Random(self.seed)
+        self.np_rng = np.random.default_rng((self.seed, 1)) # Bulk draws (enemy fire)
         self.reset()
         
     def reset(self):
         self.player = Player()
-        self.bullets = []
-        self.enemies = []
-        self.particles = []
-        self.explosions = []
-        self.powerups = []
-        self.shake = ScreenShake()
+        self.bullets.clear()
+        self.enemies.clear()
+        self.emitters.clear()
+        if self.balance.wave_every: self.bullets.reserve(BulletStore.HELL_CAPACITY)
+        Explosion.pool.release_all(self.explosions)
+        PowerUp.pool.release_all(self.powerups)
+        self.particles = ParticleSystem(seed=self.seed)
+        self.shake = ScreenShake(self.seed)
+        self.grid = SpatialHash()
         self.city_scroll = 0
         self.cloud_scroll = 0
+        self.prev_scroll = (0, 0)
         self.game_over = False
         self.difficulty = 1.0
+        self.damage_taken = 0
+        self.kills = 0
+        self.steps = 0
+        self.apply_quality()
+        if self.telemetry.game_started: self.telemetry.emit("game_started", 0, self.seed)
 
-    def draw_transparent_rect(self, x, y, w, h, color, alpha):
-        s = pygame.Surface((w, h), pygame.SRCALPHA)
-        s.fill((*color, alpha))
-        self.screen.blit(s, (x, y))
+    def cloud_pieces(self, n):
+        return [(self.cloud_img, i*300 - 200, i*50) for i in range(n)]
+
+    def apply_quality(self):
+        # Push the governor's current tier into the effects it controls
+        q = self.quality
+        self.particles.alpha = q.glow
+        if self.cloud_img and q.clouds != self.clouds_shown:
+            self.background.add("clouds", self.cloud_pieces(q.clouds), WIDTH + 200, 100)
+            self.clouds_shown = q.clouds
+
+    def govern(self, ms):
+        if self.quality.observe(ms): self.apply_quality()
+
+    def pool_stats(self):
+        return {"Bullet": self.bullets.stats(), "Enemy": self.enemies.stats(),
+                "PowerUp": PowerUp.pool.stats(), "Explosion": Explosion.pool.stats()}
+
+    def state_hash(self):
+        # CRC of everything the simulation carries between frames (cosmetic state excluded)
+        p = self.player
+        state = ((p.rect.x, p.rect.y, p.hp, p.ammo, p.score, p.bombs, p.reloading, p.reload_timer,
+                  p.triple_shot, p.shield_timer, p.speed_timer), self.difficulty, self.game_over,
+                 [(pu.type, pu.rect.x, pu.rect.y) for pu in self.powerups],
+                 self.rng.getstate(), self.np_rng.bit_generator.state)
+        crc = zlib.crc32(self.enemies.view().tobytes(), zlib.crc32(self.bullets.view().tobytes()))
+        if len(self.emitters): crc = zlib.crc32(self.emitters.view().tobytes(), crc)
+        return zlib.crc32(repr(state).encode(), crc)
+
+    def snapshot(self):
+        # Full game state as a compact byte string (see Snapshots); restore() puts it back
+        p, shake, particles = self.player, self.shake, self.particles
+        rng, shake_rng = self.rng.getstate(), shake.rng.getstate()
+        np_rng, fx_rng = self.np_rng.bit_generator.state, particles.rng.bit_generator.state
+        scalars = ([getattr(p, a) for a in PLAYER_STATE] + [*p.rect, *p.prev]
+                   + [getattr(self, a) for a in GAME_STATE] + [*self.prev_scroll, shake.timer, shake.intensity]
+                   + [rng[2], shake_rng[2], np_rng["has_uint32"], np_rng["uinteger"], fx_rng["has_uint32"], fx_rng["uinteger"]])
+        palette = particles.palette
+        return b"".join((
+            SNAPSHOT_MAGIC, struct.pack("<H", SNAPSHOT_VERSION), pack_scalars(scalars),
+            pack_mt(rng), pack_mt(shake_rng), pack_pcg(np_rng), pack_pcg(fx_rng),
+            self.enemies.snapshot(), self.bullets.snapshot(), self.emitters.snapshot(), particles.snapshot(),
+            pack_rows([(e.x, e.y, *e.color, e.life, e.radius) for e in self.explosions], 7),
+            pack_rows([(pu.rect.x, pu.rect.y, PowerUp.TYPES.index(pu.type), pu.pulse, pu.alive) for pu in self.powerups], 5),
+            struct.pack("<H", len(palette)), bytes(c for color in palette for c in color),
+        ))
+
+    def restore(self, buf):
+        if buf[:4] != SNAPSHOT_MAGIC: raise ValueError("not a game snapshot")
+        version, = struct.unpack_from("<H", buf, 4)
+        if version != SNAPSHOT_VERSION: raise ValueError(f"unsupported snapshot version {version}")
+        buf = memoryview(buf)
+        scalars, at = unpack_scalars(buf, 6)
+        p, shake, particles = self.player, self.shake, self.particles
+        k = len(PLAYER_STATE)
+        for a, v in zip(PLAYER_STATE, scalars): setattr(p, a, v)
+        p.rect.update(scalars[k:k + 4])
+        p.prev = tuple(scalars[k + 4:k + 6])
+        k += 6
+        for a, v in zip(GAME_STATE, scalars[k:]): setattr(self, a, v)
+        k += len(GAME_STATE)
+        self.prev_scroll = tuple(scalars[k:k + 2])
+        shake.timer, shake.intensity, gauss, shake_gauss, *pcg = scalars[k + 2:]
+
+        state, at = unpack_mt(buf, at, gauss)
+        self.rng.setstate(state)
+        state, at = unpack_mt(buf, at, shake_gauss)
+        shake.rng.setstate(state)
+        self.np_rng.bit_generator.state, at = unpack_pcg(buf, at, *pcg[:2])
+        particles.rng.bit_generator.state, at = unpack_pcg(buf, at, *pcg[2:])
+
+        at = self.enemies.restore(buf, at)
+        at = self.bullets.restore(buf, at)
+        at = self.emitters.restore(buf, at)
+        at = particles.restore(buf, at)
+        rows, at = unpack_rows(buf, at, 7)
+        Explosion.pool.release_all(self.explosions)
+        for x, y, r, g, b, life, radius in rows:
+            e = Explosion.pool.acquire(int(x), int(y), (int(r), int(g), int(b)))
+            e.life, e.radius = int(life), int(radius)
+            self.explosions.append(e)
+        rows, at = unpack_rows(buf, at, 5)
+        PowerUp.pool.release_all(self.powerups)
+        for x, y, kind, pulse, alive in rows:
+            pu = PowerUp.pool.acquire(int(x), int(y), PowerUp.TYPES[int(kind)])
+            pu.pulse, pu.alive = pulse, bool(alive)
+            self.powerups.append(pu)
+
+        # Palette indices are per process: remap if this one has the colours in another order
+        n, = struct.unpack_from("<H", buf, at)
+        saved = [tuple(buf[at + 2 + 3*i:at + 5 + 3*i]) for i in range(n)]
+        if saved != particles.palette[:n]:
+            remap = np.array([particles.color_index(c) for c in saved] or [0], np.float64)
+            colors = particles.view()[ParticleSystem.COLOR]
+            colors[:] = remap[colors.astype(np.intp)]
+
+    def toggle_overlay(self):
+        self.overlay = None if self.overlay else PerfOverlay(self.font)
+        self.profiler.keep_history(self.overlay is not None)
+
+    def frame_counts(self):
+        return {"bullets": len(self.bullets), "enemies": len(self.enemies), "particles": len(self.particles),
+                "explosions": len(self.explosions), "powerups": len(self.powerups)}
 
     def update(self):
+        keys = self.controller.poll(self)
+        if keys[pygame.K_F3] and not self.f3_held: self.toggle_overlay()
+        self.f3_held = keys[pygame.K_F3]
+        self.profiler.run("update", self.simulate, keys)
+
+    def simulate(self, keys):
+        self.steps += 1
+        self.profiler.run("update/background", self.scroll_background)
         if self.game_over:
-            keys = pygame.key.get_pressed()
             if keys[pygame.K_r]: self.reset()
             return
 
+        # Phases keep the original interleaving; repeated names add up within a frame
+        run = self.profiler.run
+        run("update/movement", self.update_player, keys)
+        run("update/particles", self.update_effects)
+        run("update/movement", self.move_bullets)
+        run("update/collisions", self.collide_bullets)
+        run("update/movement", self.move_enemies)
+        run("update/collisions", self.collide_enemies)
+        run("update/movement", self.move_powerups)
+        run("update/collisions", self.collide_powerups)
+
+    def update_player(self, keys):
         # ---- Difficulty Scaling ----
-        # Difficulty increases by 0.1 every 500 points
-        self.difficulty = 1.0 + (self.player.score / 500)
+        # Difficulty increases by 1.0 every score_per_level (500) points
+        b = self.balance
+        tel = self.telemetry
+        level = self.difficulty
+        self.difficulty = 1.0 + (self.player.score / b.score_per_level)
+        if tel.difficulty_changed and int(self.difficulty) != int(level):
+            tel.emit("difficulty_changed", self.steps, self.difficulty)
 
-        keys = pygame.key.get_pressed()
         self.player.move(keys)
         self.player.update()
         
-        # Engine Trails (Yellow if speed boosted)
-        trail_col = NEON_YELLOW if self.player.speed_timer > 0 else NEON_BLUE
-        self.particles.append(TrailParticle(self.player.rect.centerx - 10, self.player.rect.bottom - 10, trail_col))
-        self.particles.append(TrailParticle(self.player.rect.centerx + 10, self.player.rect.bottom - 10, trail_col))
+        # Engine Trails (Yellow if speed boosted); thinned out on lower quality tiers
+        trail = self.quality.trail
+        if trail and self.steps % trail == 0:
+            trail_col = NEON_YELLOW if self.player.speed_timer > 0 else NEON_BLUE
+            cx, by = self.player.rect.centerx, self.player.rect.bottom - 10
+            self.particles.emit((cx - 10, cx + 10), (by, by), trail_col)
 
         # Shooting
         if keys[pygame.K_SPACE] and not self.player.reloading:
             if self.player.ammo > 0:
-                if random.random() < 0.2: 
+                if self.rng.random() < 0.2: 
                     assets.play("shoot.wav", 0.2)
-                    self.bullets.append(Bullet(self.player.rect.left + 10, self.player.rect.centery))
-                    self.bullets.append(Bullet(self.player.rect.right - 10, self.player.rect.centery))
+                    self.bullets.spawn(self.player.rect.left + 10, self.player.rect.centery)
+                    self.bullets.spawn(self.player.rect.right - 10, self.player.rect.centery)
                     self.player.ammo -= 1
                     
                     if self.player.triple_shot > 0:
-                        self.bullets.append(Bullet(self.player.rect.centerx, self.player.rect.top - 10))
+                        self.bullets.spawn(self.player.rect.centerx, self.player.rect.top - 10)
                         
                     if self.player.ammo <= 0:
                         self.player.reloading = True
@@ -372,175 +1888,372 @@ class Game:
             self.player.bombs -= 1
             self.shake.trigger(20, 20)
             assets.play("bomb.wav")
-            for e in self.enemies:
-                self.explosions.append(Explosion(e.rect.centerx, e.rect.centery, NEON_ORANGE))
-                self.player.score += 50
-            self.enemies = []
-            self.bullets = [b for b in self.bullets if not b.is_enemy] # Clear enemy bullets
+            if tel.bomb_used: tel.emit("bomb_used", self.steps, len(self.enemies), self.player.bombs)
+            for x, y in zip(*self.enemies.centers()):
+                self.explosions.append(Explosion.pool.acquire(x, y, NEON_ORANGE))
+                self.player.score += b.bomb_score
+            self.enemies.clear()
+            self.bullets.keep(self.bullets.view()[BulletStore.ENEMY] == 0) # Clear enemy bullets
 
         # Spawning (Faster based on difficulty)
-        spawn_chance = 0.02 * self.difficulty
-        if random.random() < spawn_chance:
-            self.enemies.append(Enemy(WIDTH, HEIGHT, self.difficulty))
-
-        # Update Lists
-        for p in self.particles[:]: 
-            p.update()
-            if p.life <= 0: self.particles.remove(p)
-            
-        for ex in self.explosions[:]:
-            ex.update()
-            if ex.life <= 0: self.explosions.remove(ex)
-            
-        for b in self.bullets[:]:
-            b.update()
-            
+        spawn_chance = b.spawn_rate * self.difficulty
+        if self.rng.random() < spawn_chance:
+            i = self.enemies.spawn(WIDTH, HEIGHT, self.difficulty, self.rng, b)
+            if tel.enemy_spawned:
+                d = self.enemies.data
+                tel.emit("enemy_spawned", self.steps, d[EnemyStore.TYPE, i], d[EnemyStore.X, i])
+
+        # Boss waves (bullet-hell mode): a row of emitters every wave_every steps
+        if b.wave_every and self.steps % b.wave_every == 0: self.spawn_wave(self.steps // b.wave_every - 1)
+
+    def spawn_wave(self, wave):
+        # wave: 0-based wave number; the patterns take turns
+        b = self.balance
+        pattern = b.wave_patterns[wave % len(b.wave_patterns)]
+        n = b.wave_emitters
+        for i in range(n):
+            self.emitters.spawn(WIDTH * (i + 1) / (n + 1), 40, pattern, vy=0.25, delay=i * 2)
+
+    def scroll_background(self):
+        # Scenery and shake tick with the simulation so their speed doesn't follow the frame rate
+        self.prev_scroll = (self.cloud_scroll, self.city_scroll)
+        self.cloud_scroll -= 0.5
+        self.city_scroll -= 2 + (self.difficulty * 0.5) # Scroll faster on higher diff
+        self.shake.update()
+
+    def update_effects(self):
+        self.particles.update()
+        for ex in self.explosions: ex.update()
+        Explosion.pool.compact(self.explosions)
+
+    def move_bullets(self):
+        self.bullets.update()
+
+    def collide_bullets(self):
+        # Broadphase pairs, vectorized narrowphase, then only the actual overlaps are walked in
+        # bullet order (first live enemy in list order takes the hit), as the nested loops did
+        bullets, enemies, player = self.bullets, self.enemies, self.player
+        bullet_boxes, player_box = bullets.boxes(), boxes([player.rect])
+        enemy_boxes = enemies.boxes()
+        from_enemy = bullets.view()[BulletStore.ENEMY] != 0
+        mine, theirs = np.flatnonzero(~from_enemy), np.flatnonzero(from_enemy)
+        bi, ej = self.grid.pairs(bullet_boxes[mine], enemy_boxes)
+        bi = mine[bi]
+        hit = overlaps(bullet_boxes[bi], enemy_boxes[ej])
+        targets = {}
+        for i, j in zip(bi[hit].tolist(), ej[hit].tolist()): targets.setdefault(i, []).append(j)
+        # Enemy fire only meets the one player box: a flat test is cheaper than hashing it
+        hits_player = set(theirs[overlaps(bullet_boxes[theirs], player_box[0])].tolist())
+
+        bx, by = bullets.view()[BulletStore.X], bullets.view()[BulletStore.Y]
+        hp = enemies.view()[EnemyStore.HP]
+        spent = np.zeros(len(bullets), bool)
+        tel = self.telemetry
+        for i in sorted(targets.keys() | hits_player):
+            cx, cy = int(bx[i]) + 3, int(by[i]) + 10
+
             # 1. Enemy Bullet Hits Player
-            if b.is_enemy:
-                if b.rect.colliderect(self.player.rect):
-                    if self.player.shield_timer <= 0:
-                        self.player.hp -= 10
-                        self.shake.trigger(10, 10)
-                        self.explosions.append(Explosion(b.rect.centerx, b.rect.centery, NEON_RED))
-                        if self.player.hp <= 0: self.game_over = True
-                    else:
-                        # Shield blocked it
-                        self.explosions.append(Explosion(b.rect.centerx, b.rect.centery, NEON_CYAN))
-                    
-                    self.bullets.remove(b)
+            if i in hits_player:
+                if player.shield_timer <= 0:
+                    player.hp -= self.balance.bullet_damage
+                    self.damage_taken += self.balance.bullet_damage
+                    self.shake.trigger(10, 10)
+                    self.explosions.append(Explosion.pool.acquire(cx, cy, NEON_RED))
+                    if tel.player_damaged: tel.emit("player_damaged", self.steps, self.balance.bullet_damage, player.hp, 0)
+                    if player.hp <= 0: self.end_game()
+                else:
+                    # Shield blocked it
+                    self.explosions.append(Explosion.pool.acquire(cx, cy, NEON_CYAN))
+                if tel.bullet_hit: tel.emit("bullet_hit", self.steps, 1 if player.shield_timer <= 0 else 2, cx, cy)
+                spent[i] = True
+                continue
 
             # 2. Player Bullet Hits Enemy
-            else:
-                for e in self.enemies:
-                    if b.rect.colliderect(e.rect):
-                        e.hp -= 10
-                        self.explosions.append(Explosion(b.rect.centerx, b.rect.centery, NEON_ORANGE))
-                        if b in self.bullets: self.bullets.remove(b)
-                        
-                        if e.hp <= 0:
-                            if e in self.enemies: self.enemies.remove(e)
-                            self.player.score += 100 * self.difficulty
-                            assets.play("explode.wav")
-                            self.shake.trigger(5, 5)
-                            
-                            # Drop Loot (Variety)
-                            if random.random() < 0.25:
-                                opts = ["HP", "TRIPLE", "SHIELD", "SPEED", "BOMB"]
-                                # Weights: HP(30), TRIPLE(25), SHIELD(15), SPEED(20), BOMB(10)
-                                ptype = random.choices(opts, weights=[30, 25, 15, 20, 10], k=1)[0]
-                                self.powerups.append(PowerUp(e.rect.centerx, e.rect.centery, ptype))
-                        break
-            
-            if b.rect.y < -50 or b.rect.y > HEIGHT + 50 or b.rect.x < -50 or b.rect.x > WIDTH + 50: 
-                if b in self.bullets: self.bullets.remove(b)
+            for j in targets[i]:
+                if hp[j] <= 0: continue # Already destroyed this frame
+                hp[j] -= 10
+                self.explosions.append(Explosion.pool.acquire(cx, cy, NEON_ORANGE))
+                spent[i] = True
+                if tel.bullet_hit: tel.emit("bullet_hit", self.steps, 0, cx, cy)
+
+                if hp[j] <= 0:
+                    player.score += self.balance.kill_score * self.difficulty
+                    self.kills += 1
+                    if tel.enemy_killed:
+                        tel.emit("enemy_killed", self.steps, enemies.view()[EnemyStore.TYPE, j], *(enemy_boxes[j, :2] + 25))
+                    assets.play("explode.wav")
+                    self.shake.trigger(5, 5)
+
+                    # Drop Loot (Variety)
+                    if self.rng.random() < self.balance.loot_chance:
+                        ptype = self.rng.choices(PowerUp.TYPES, weights=self.balance.loot_weights, k=1)[0]
+                        ex, ey = enemy_boxes[j, :2] + 25
+                        self.powerups.append(PowerUp.pool.acquire(int(ex), int(ey), ptype))
+                break
 
+        enemies.keep((hp > 0) & (enemies.view()[EnemyStore.Y] <= HEIGHT + 100))
+        bullets.keep(~spent & bullets.on_screen())
+
+    def end_game(self):
+        if not self.game_over and self.telemetry.game_over:
+            self.telemetry.emit("game_over", self.steps, self.player.score, self.kills, self.damage_taken)
+        self.game_over = True
+
+    def move_enemies(self):
         # Update Enemies (Pass player rect for aiming)
-        for e in self.enemies[:]: 
-            e.update(self.bullets, self.player.rect)
-            
-            # Collision: Player hits Enemy Body
-            if e.rect.colliderect(self.player.rect):
-                if self.player.shield_timer <= 0:
-                    self.player.hp -= 30
-                    self.shake.trigger(20, 10)
-                    e.hp = 0 # Kamikaze successful
-                else:
-                    e.hp = 0 # Shield kills enemy
-                
-                if e.hp <= 0 and e in self.enemies:
-                     self.enemies.remove(e)
-                     self.explosions.append(Explosion(e.rect.centerx, e.rect.centery, NEON_ORANGE))
-                
-                if self.player.hp <= 0: self.game_over = True
-
-            if e.rect.y > HEIGHT + 100: self.enemies.remove(e)
-        
+        self.enemies.update(self.bullets, self.player.rect, self.np_rng)
+        self.emitters.update(self.bullets, self.player.rect)
+
+    def collide_enemies(self):
+        # Collision: Player hits Enemy Body
+        enemies, player = self.enemies, self.player
+        enemy_boxes, player_box = enemies.boxes(), boxes([player.rect])
+        ej, _ = self.grid.pairs(enemy_boxes, player_box)
+        hp = enemies.view()[EnemyStore.HP]
+        tel = self.telemetry
+        for j in ej[overlaps(enemy_boxes[ej], player_box[0])].tolist():
+            if player.shield_timer <= 0:
+                player.hp -= self.balance.ram_damage
+                self.damage_taken += self.balance.ram_damage
+                self.shake.trigger(20, 10)
+                hp[j] = 0 # Kamikaze successful
+                if tel.player_damaged: tel.emit("player_damaged", self.steps, self.balance.ram_damage, player.hp, 1)
+            else:
+                hp[j] = 0 # Shield kills enemy
+
+            ex, ey = enemy_boxes[j, :2] + 25
+            self.explosions.append(Explosion.pool.acquire(int(ex), int(ey), NEON_ORANGE))
+            if player.hp <= 0: self.end_game()
+
+        enemies.keep((hp > 0) & (enemies.view()[EnemyStore.Y] <= HEIGHT + 100))
+
+    def move_powerups(self):
+        for pu in self.powerups: pu.update()
+
+    def collide_powerups(self):
         # Powerup Collection
-        for pu in self.powerups[:]:
-            pu.update()
+        touching = self.grid.candidates(boxes([pu.rect for pu in self.powerups]), boxes([self.player.rect]))
+        for i in touching:
+            pu = self.powerups[i]
             if pu.rect.colliderect(self.player.rect):
                 assets.play("powerup.wav")
+                if self.telemetry.powerup_collected:
+                    self.telemetry.emit("powerup_collected", self.steps, PowerUp.TYPES.index(pu.type))
                 if pu.type == "HP": self.player.hp = min(100, self.player.hp + 30)
                 elif pu.type == "TRIPLE": self.player.triple_shot = 300
                 elif pu.type == "SHIELD": self.player.shield_timer = 300 # 5 Seconds
                 elif pu.type == "SPEED": self.player.speed_timer = 300
                 elif pu.type == "BOMB": self.player.bombs += 1
-                
-                self.powerups.remove(pu)
-            elif pu.rect.y > HEIGHT:
-                self.powerups.remove(pu)
+                pu.alive = False
+        PowerUp.pool.compact(self.powerups)
 
-    def draw(self):
-        ox, oy = self.shake.get_offset()
-        
-        # Background
-        if self.bg_img: self.screen.blit(self.bg_img, (ox, oy))
-        else: self.screen.fill((20, 20, 40))
-        
-        # Clouds
-        self.cloud_scroll -= 0.5
-        if self.cloud_img:
-            for i in range(4):
-                x_pos = (self.cloud_scroll + i*300) % (WIDTH + 200) - 200
-                self.screen.blit(self.cloud_img, (x_pos + ox, 100 + i*50 + oy))
+    def draw(self, alpha=1.0):
+        # alpha: how far between the previous and current simulation step to render (1 = current)
+        self.profiler.run("draw", self.render, 1.0 - alpha)
+        if self.overlay: self.overlay.draw(self.screen, self.profiler, {**self.profiler.counts, **self.frame_counts()}, self.quality.name)
+        if self.capture: self.capture.grab(self.screen)
+        if not self.headless: pygame.display.flip()
 
-        # City
-        self.city_scroll -= 2 + (self.difficulty * 0.5) # Scroll faster on higher diff
-        if self.city_img:
-            cw = self.city_img.get_width()
-            cx = self.city_scroll % cw
-            self.screen.blit(self.city_img, (cx - cw + ox, HEIGHT - 300 + oy))
-            self.screen.blit(self.city_img, (cx + ox, HEIGHT - 300 + oy))
+    def end_frame(self):
+        # Closes the profiler frame (history, traces, hooks); call once per update/draw pair
+        if self.profiler.enabled: self.profiler.end_frame(self.frame_counts(), self.clock.get_fps())
+        assets.voices.end_frame()
+        self.telemetry.end_frame()
+
+    def render(self, back):
+        ox, oy = self.shake.get_offset() if self.quality.shake else (0, 0)
+        run = self.profiler.run
+        run("draw/background", self.draw_background, ox, oy, back)
+        # After game over only the scenery still steps; the frozen world has nothing to rewind to
+        world = 0.0 if self.game_over else back
+        self.profiler.count("blits", run("draw/particles", self.particles.draw, self.screen, ox, oy, world))
+        run("draw/entities", self.draw_entities, ox, oy, world)
+        run("draw/hud", self.draw_hud)
+
+    def draw_background(self, ox, oy, back):
+        cloud_scroll = self.cloud_scroll + (self.prev_scroll[0] - self.cloud_scroll) * back
+        city_scroll = self.city_scroll + (self.prev_scroll[1] - self.city_scroll) * back
+
+        scrolls = {"clouds": cloud_scroll, "city": city_scroll}
+        self.profiler.count("blits", self.background.draw(self.screen, scrolls, ox, oy))
 
+    def draw_entities(self, ox, oy, back):
         # Game Layer
-        for p in self.particles: p.draw(self.screen, ox, oy)
-        self.player.draw(self.screen, ox, oy)
-        for e in self.enemies: e.draw(self.screen, ox, oy)
-        for b in self.bullets: b.draw(self.screen, ox, oy)
-        for ex in self.explosions: ex.draw(self.screen, ox, oy)
-        for pu in self.powerups: pu.draw(self.screen, ox, oy)
-
-        # UI
-        # Health
-        self.draw_transparent_rect(10, 10, 220, 60, BLACK, 120)
-        pygame.draw.rect(self.screen, NEON_RED, (15, 25, 200 * (self.player.hp/100), 10), border_radius=5)
-        self.screen.blit(self.font.render("SHIELD INTEGRITY", True, WHITE), (15, 10))
-        
-        # Score & Difficulty
-        score_txt = self.big_font.render(f"{int(self.player.score):06d}", True, NEON_BLUE)
-        self.screen.blit(score_txt, (WIDTH - score_txt.get_width() - 20, 10))
-        
-        diff_txt = self.font.render(f"THREAT LEVEL: {self.difficulty:.1f}", True, NEON_RED)
-        self.screen.blit(diff_txt, (WIDTH - score_txt.get_width() - 20, 50))
-        
-        # Bombs
-        bomb_txt = self.font.render(f"BOMBS: {self.player.bombs} [B]", True, NEON_ORANGE)
-        self.screen.blit(bomb_txt, (15, 45))
+        p = self.player
+        self.player.draw(self.screen, ox + (p.prev[0] - p.rect.x) * back, oy + (p.prev[1] - p.rect.y) * back)
+        blits = self.enemies.draw(self.screen, ox, oy, back) + self.bullets.draw(self.screen, ox, oy, back)
+        detail = self.quality.explosions
+        for ex in self.explosions: ex.draw(self.screen, ox, oy, back, detail)
+        self.screen.blits([pu.sprite(ox, oy, back) for pu in self.powerups], doreturn=False)
+        if self.profiler.enabled:
+            self.profiler.count("blits", bool(self.player.image) + blits + len(self.powerups))
 
-        # Active Powerup Text
-        if self.player.shield_timer > 0:
-            self.screen.blit(self.font.render("SHIELD ACTIVE", True, NEON_CYAN), (WIDTH//2 - 50, HEIGHT - 80))
-        if self.player.speed_timer > 0:
-             self.screen.blit(self.font.render("SPEED BOOST", True, NEON_YELLOW), (WIDTH//2 - 50, HEIGHT - 60))
+    def draw_hud(self):
+        self.profiler.count("blits", self.hud.draw(self.screen, self))
 
-        if self.game_over:
-            self.draw_transparent_rect(0, HEIGHT//2 - 60, WIDTH, 120, BLACK, 200)
-            go_txt = self.big_font.render("MISSION FAILED", True, NEON_RED)
-            re_txt = self.font.render("PRESS R TO RESTART", True, WHITE)
-            self.screen.blit(go_txt, (WIDTH//2 - go_txt.get_width()//2, HEIGHT//2 - 20))
-            self.screen.blit(re_txt, (WIDTH//2 - re_txt.get_width()//2, HEIGHT//2 + 30))
+# ---- Frame Loop ----
+class FrameLoop:
+    # Fixed-timestep driver: the simulation always advances in whole 1/FPS steps (several per
+    # frame when the display falls behind, capped at max_steps) and every displayed frame is
+    # drawn between the last two steps. Pacing "raf" just yields, so in the browser each frame
+    # lines up with requestAnimationFrame; "cap" sleeps in clock.tick() to a fixed rate.
+    STEP = 1.0 / FPS
+
+    def __init__(self, game, pacing=None, max_steps=5, max_fps=None):
+        self.game = game
+        self.pacing = pacing or ("raf" if sys.platform == "emscripten" else "cap")
+        self.max_steps = max_steps
+        self.max_fps = max_fps or FPS
+        self.acc = 0.0
+        self.dropped = 0.0 # Simulation time given up to avoid a catch-up spiral (seconds)
+
+    def advance(self, elapsed):
+        # Run the steps `elapsed` seconds of wall time buys; returns the interpolation alpha
+        self.acc += min(elapsed, 0.25)
+        steps = 0
+        while self.acc >= self.STEP and steps < self.max_steps:
+            self.game.update()
+            self.acc -= self.STEP
+            steps += 1
+        if self.acc >= self.STEP:
+            self.dropped += self.acc - self.acc % self.STEP
+            self.acc %= self.STEP
+        return self.acc / self.STEP
+
+    async def run(self):
+        game, last = self.game, time.perf_counter()
+        while True:
+            # Drain every event (a full SDL queue would swallow QUIT); window closed: main() saves
+            # the recording, capture and telemetry
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT: return
+            now = time.perf_counter()
+            alpha = self.advance(now - last)
+            last = now
+            game.draw(alpha)
+            if not startup.done: startup.finish()
+            game.end_frame()
+            # Work time only: in the browser the clock's frame time also holds the rAF wait
+            game.govern((time.perf_counter() - now) * 1000)
+            game.clock.tick(self.max_fps if self.pacing == "cap" else 0)
+            await asyncio.sleep(0)
 
+async def load_assets(screen):
+    # Loading screen: a progress bar over the manifest preload, redrawn after every item
+    bar = pygame.Rect(WIDTH // 4, HEIGHT // 2, WIDTH // 2, 10)
+    label = assets.font(16).render("LOADING", True, NEON_BLUE)
+    def progress(done, total):
+        pygame.event.pump()
+        screen.fill(BLACK)
+        screen.blit(label, label.get_rect(midbottom=(WIDTH // 2, bar.top - 8)))
+        pygame.draw.rect(screen, NEON_BLUE, (bar.x, bar.y, bar.w * done // max(total, 1), bar.h))
+        pygame.draw.rect(screen, WHITE, bar, 1)
         pygame.display.flip()
+    progress(0, 1)
+    await assets.preload(MANIFEST, progress)
 
-async def main():
+async def main(seed=None, record=None, pacing=None, quality=None, capture=None, telemetry=None, balance=None):
+    startup.mark("imports")
     pygame.init()
     pygame.mixer.init()
-    game = Game()
-    while True:
+    startup.mark("init")
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption("Sky Force: WASM")
+    startup.mark("display")
+    await load_assets(screen)
+    startup.mark("assets")
+    recorder = Recorder(KeyboardController()) if record else None
+    game = Game(seed=seed, controller=recorder, balance=balance, telemetry=telemetry)
+    startup.mark("game")
+    if quality and quality != "auto":
+        game.quality.lock(quality)
+        game.apply_quality()
+    game.capture = capture
+    try:
+        await FrameLoop(game, pacing).run()
+    finally:
+        if recorder: recorder.save(record)
+        if capture: print("capture:", capture.close())
+        if telemetry: print("telemetry:", telemetry.close())
+
+# ---- Headless Simulation ----
+def init_headless():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("SDL_NO_SIGNAL_HANDLERS", "1") # Keep SIGTERM/SIGINT fatal (pool workers, Ctrl-C)
+    pygame.init()
+    assets.muted = True
+
+def run_headless(frames, seed=None, controller=None, render=False, trace=None, capture=None, telemetry=None,
+                 balance=None):
+    # No window, no audio, no frame cap: Game.update back to back, one call = one 1/60 s step
+    init_headless()
+    game = Game(headless=True, seed=seed, controller=controller, balance=balance, telemetry=telemetry)
+    game.capture = capture
+    render = render or capture is not None
+    start = time.perf_counter()
+    if trace: game.profiler.capture(frames)
+    for _ in range(frames):
         game.update()
-        game.draw()
-        game.clock.tick(FPS)
-        await asyncio.sleep(0)
+        if render: game.draw()
+        game.end_frame()
+    elapsed = time.perf_counter() - start
+    if trace: game.profiler.save_trace(trace)
+    return {"seed": game.seed, "frames": frames, "seconds": elapsed, "capture": capture.close() if capture else None,
+            "sim_minutes": frames / FPS / 60, "sim_fps": frames / elapsed if elapsed else float("inf"),
+            "score": int(game.player.score), "game_over": game.game_over,
+            "telemetry": telemetry.close() if telemetry else None}
+
+def cli(argv):
+    import argparse
+    ap = argparse.ArgumentParser(description="Sky Force")
+    ap.add_argument("--headless", action="store_true", help="run the simulation without a window")
+    ap.add_argument("--frames", type=int, default=FPS * 60, help="simulation steps for --headless")
+    ap.add_argument("--seed", type=int, help="RNG seed (random if omitted)")
+    ap.add_argument("--render", action="store_true", help="also run Game.draw off-screen in --headless")
+    ap.add_argument("--trace", metavar="PATH", help="write a Chrome trace / Perfetto JSON of the --headless run")
+    ap.add_argument("--record", metavar="PATH", help="record input + seed to a replay file")
+    ap.add_argument("--replay", metavar="PATH", help="re-simulate a replay headless and verify its state hashes")
+    ap.add_argument("--pacing", choices=("raf", "cap"), help="frame pacing (default: raf in the browser, cap elsewhere)")
+    ap.add_argument("--bullet-hell", action="store_true",
+                    help="boss waves of bullet patterns (recorded: --replay takes it from the file)")
+    ap.add_argument("--startup", action="store_true", help="print the cold-start timeline after the first frame")
+    ap.add_argument("--capture", metavar="DIR", help="record rendered frames into DIR (implies --render)")
+    ap.add_argument("--capture-format", choices=FrameCapture.FORMATS, default="png",
+                    help="png sequence or raw rgb24 video (frames.rgb + frames.json)")
+    ap.add_argument("--telemetry", metavar="PATH", help="log gameplay events to PATH (JSONL if it ends in .jsonl, else binary)")
+    ap.add_argument("--telemetry-events", metavar="NAMES", help=f"comma-separated subset of {', '.join(Telemetry.NAMES)}")
+    ap.add_argument("--quality", choices=("auto", *(t[0] for t in QualityGovernor.TIERS)), default="auto",
+                    help="visual quality tier (default: auto, adapts to frame time)")
+    args, _ = ap.parse_known_args(argv)
+    # Offline runs wait for the writer so no frame is lost; the live game drops instead of stalling
+    capture = args.capture and FrameCapture(args.capture, args.capture_format,
+                                            policy="wait" if args.replay or args.headless else "drop")
+    events = args.telemetry_events.split(",") if args.telemetry_events else None
+    telemetry = args.telemetry and Telemetry(args.telemetry, events)
+    balance = BULLET_HELL if args.bullet_hell else None
+    if args.replay:
+        replay = Replay.load(args.replay)
+        stats = run_headless(len(replay.inputs), replay.seed, replay, render=args.render, trace=args.trace,
+                             capture=capture, telemetry=telemetry, balance=replay.balance)
+        if replay.diverged_at is not None:
+            sys.exit(f"replay diverged at frame {replay.diverged_at} ({replay.checked} checkpoints)")
+        print(f"replay OK: {stats['frames']} frames, {replay.checked} checkpoints in {stats['seconds']:.2f}s, "
+              f"score {stats['score']}")
+        if capture: print("capture:", stats["capture"])
+        if telemetry: print("telemetry:", stats["telemetry"])
+    elif args.headless:
+        recorder = Recorder(AutoPilot()) if args.record else None
+        stats = run_headless(args.frames, args.seed, recorder, render=args.render, trace=args.trace,
+                             capture=capture, telemetry=telemetry, balance=balance)
+        if recorder: recorder.save(args.record)
+        print(f"seed {stats['seed']}: {stats['frames']} frames ({stats['sim_minutes']:.1f} sim min) "
+              f"in {stats['seconds']:.2f}s = {stats['sim_fps']:.0f} sim FPS, score {stats['score']}")
+        if capture: print("capture:", stats["capture"])
+        if telemetry: print("telemetry:", stats["telemetry"])
+    else:
+        startup.verbose = args.startup
+        asyncio.run(main(args.seed, args.record, args.pacing, args.quality, capture, telemetry, balance))
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    cli(sys.argv[1:])
\ No newline at end of file
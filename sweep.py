@@ -0,0 +1,161 @@
+# Balance sweeps: many seeded headless games per Balance configuration, spread over a process pool.
+#   python sweep.py --param spawn_rate=0.015 --param spawn_rate=0.03 --seeds 200 --out runs
+#   python sweep.py --param "loot_weights=(50, 10, 10, 20, 10)" --param score_per_level=300 --seeds 100
+# Repeated --param values for one name are alternatives; the sweep covers their cartesian
+# product. Results stream into a columnar directory (one raw file per column, see load()).
+import argparse
+import ast
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+import main
+from main import Game, Balance, AutoPilot, FPS
+
+COLUMNS = {  # name -> dtype, one row per game
+    "config": np.int32,
+    "seed": np.int64,
+    "frames": np.int32,          # survival time in simulation steps
+    "survived": np.bool_,        # reached --max-frames without game over
+    "score": np.float64,
+    "kills": np.int32,
+    "damage_taken": np.float64,
+    "max_difficulty": np.float64,
+    "peak_enemies": np.int32,
+    "peak_bullets": np.int32,
+    "peak_powerups": np.int32,
+    "peak_particles": np.int32,
+    "wall_seconds": np.float64,
+}
+
+# ---- Worker ----
+_game = None
+
+def play(job):
+    # One game to game over (or max_frames) under the scripted policy; reuses one Game per process
+    global _game
+    config, params, seed, max_frames = job
+    if _game is None:
+        main.init_headless()
+        _game = Game(headless=True, seed=seed, controller=AutoPilot())
+    game = _game
+    game.balance = Balance(**params)
+    game.new_game(seed)
+    start = time.perf_counter()
+    peaks = [0, 0, 0, 0]
+    frames = 0
+    while frames < max_frames and not game.game_over:
+        game.update()
+        frames += 1
+        counts = (len(game.enemies), len(game.bullets), len(game.powerups), len(game.particles))
+        peaks = [max(a, b) for a, b in zip(peaks, counts)]
+    return {"config": config, "seed": seed, "frames": frames, "survived": not game.game_over,
+            "score": game.player.score, "kills": game.kills, "damage_taken": game.damage_taken,
+            "max_difficulty": game.difficulty, "peak_enemies": peaks[0], "peak_bullets": peaks[1],
+            "peak_powerups": peaks[2], "peak_particles": peaks[3],
+            "wall_seconds": time.perf_counter() - start}
+
+# ---- Results ----
+class ColumnWriter:
+    # Appends rows to <out>/<column>.bin in batches; schema.json records dtypes and configs
+    def __init__(self, out, configs, flush_every=256):
+        os.makedirs(out, exist_ok=True)
+        self.out = out
+        self.flush_every = flush_every
+        self.rows = []
+        self.count = 0
+        for name in COLUMNS: open(self.path(name), "wb").close()
+        schema = {"columns": {name: np.dtype(dt).str for name, dt in COLUMNS.items()},
+                  "configs": configs, "rows": 0}
+        self.write_schema(schema)
+        self.schema = schema
+
+    def path(self, name):
+        return os.path.join(self.out, name + ".bin")
+
+    def write_schema(self, schema):
+        with open(os.path.join(self.out, "schema.json"), "w") as f: json.dump(schema, f, indent=2)
+
+    def append(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.flush_every: self.flush()
+
+    def flush(self):
+        if not self.rows: return
+        for name, dt in COLUMNS.items():
+            with open(self.path(name), "ab") as f:
+                np.fromiter((r[name] for r in self.rows), dt, len(self.rows)).tofile(f)
+        self.count += len(self.rows)
+        self.rows = []
+        self.schema["rows"] = self.count
+        self.write_schema(self.schema)
+
+def load(out):
+    # -> ({column: array}, configs); rows past the last schema update (a killed sweep) are ignored
+    with open(os.path.join(out, "schema.json")) as f: schema = json.load(f)
+    n = schema["rows"]
+    cols = {name: np.fromfile(os.path.join(out, name + ".bin"), np.dtype(dt), n)
+            for name, dt in schema["columns"].items()}
+    return cols, schema["configs"]
+
+# ---- Runner ----
+def grid(params):
+    # {"name": [v1, v2], ...} -> list of override dicts (cartesian product)
+    names = list(params)
+    return [dict(zip(names, values)) for values in itertools.product(*(params[n] for n in names))]
+
+def summarize(cols, configs):
+    lines = []
+    for i, params in enumerate(configs):
+        m = cols["config"] == i
+        if not m.any(): continue
+        lines.append(f"config {i} {params or '(defaults)'}: {m.sum()} games, "
+                     f"survival {cols['frames'][m].mean() / FPS:.1f}s (p10 {np.percentile(cols['frames'][m], 10) / FPS:.1f}s), "
+                     f"score {cols['score'][m].mean():.0f}, damage {cols['damage_taken'][m].mean():.0f}, "
+                     f"survived {cols['survived'][m].mean():.0%}")
+    return "\n".join(lines)
+
+def run(configs, seeds, out, seed0=0, max_frames=FPS * 300, jobs=None, flush_every=256):
+    for params in configs: Balance(**params) # Fail fast on unknown names
+    writer = ColumnWriter(out, configs, flush_every)
+    work = [(i, params, seed0 + s, max_frames) for i, params in enumerate(configs) for s in range(seeds)]
+    start = time.perf_counter()
+    with multiprocessing.Pool(jobs or os.cpu_count()) as pool:
+        for row in pool.imap_unordered(play, work, chunksize=max(1, len(work) // (64 * (jobs or os.cpu_count())))):
+            writer.append(row)
+    writer.flush()
+    return writer.count, time.perf_counter() - start
+
+def parse_params(items, ap):
+    params = {}
+    for item in items:
+        name, sep, value = item.partition("=")
+        if not sep: ap.error(f"--param needs name=value, got {item!r}")
+        if name not in Balance.DEFAULTS: ap.error(f"unknown balance parameter {name!r}")
+        try: value = ast.literal_eval(value)
+        except (ValueError, SyntaxError): ap.error(f"bad value for {name}: {value!r}")
+        params.setdefault(name, []).append(value)
+    return params
+
+def cli(argv):
+    ap = argparse.ArgumentParser(description="Sky Force balance sweeps")
+    ap.add_argument("--param", action="append", default=[], metavar="NAME=VALUE",
+                    help=f"balance override; repeat a name to sweep it ({', '.join(Balance.DEFAULTS)})")
+    ap.add_argument("--seeds", type=int, default=100, help="games per configuration")
+    ap.add_argument("--seed0", type=int, default=0, help="first seed")
+    ap.add_argument("--max-frames", type=int, default=FPS * 300, help="cap per game (default: 5 sim minutes)")
+    ap.add_argument("--jobs", type=int, help="worker processes (default: all cores)")
+    ap.add_argument("--out", default="sweep_results", help="results directory")
+    args = ap.parse_args(argv)
+    configs = grid(parse_params(args.param, ap))
+    rows, seconds = run(configs, args.seeds, args.out, args.seed0, args.max_frames, args.jobs)
+    print(summarize(*load(args.out)))
+    print(f"{rows} games in {seconds:.1f}s ({rows / seconds:.1f} games/s) -> {args.out}")
+
+if __name__ == "__main__":
+    cli(sys.argv[1:])